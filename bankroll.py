@@ -0,0 +1,247 @@
+import argparse
+import math
+
+import numpy as np
+
+from blackjack import RuleSet, default_rules, format_dollars, to_cents
+from simulation import deal_rounds, settle_rounds
+
+"""
+Bankroll and risk of ruin simulator for Chinese Blackjack (Ban Luck)
+Plays many full sessions, from a starting stack until the user's or the computer dealer's stack runs out,
+same as main(). The statistics are streamed, so memory stays the same however many sessions are played
+"""
+
+# A bet policy takes in arrays of the user's and computer dealer's stacks in cents, and returns the bets
+# The bets are capped at the user's stack, same as main()
+
+
+def flat_bet(cents):
+
+    return lambda user_stacks, dealer_stacks: np.full(len(user_stacks), cents, dtype=np.int64)
+
+
+def proportional_bet(fraction):
+
+    return lambda user_stacks, dealer_stacks: np.maximum((user_stacks * fraction).astype(np.int64), 1)
+
+# Running mean and variance with Welford's algorithm
+
+
+class RunningStats():
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def std(self):
+        return math.sqrt(self.variance())
+
+# Streaming quantile estimate with the P-squared algorithm (Jain and Chlamtac)
+# Keeps 5 markers instead of the values, so it uses the same memory however many values are added
+
+
+class P2Quantile():
+
+    def __init__(self, p):
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, value):
+
+        heights = self.heights
+
+        # The first 5 values become the markers
+        if len(heights) < 5:
+            heights.append(value)
+            heights.sort()
+            return
+
+        # Find the cell of the value, moving the outer markers if needed
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = 0
+            while value >= heights[cell + 1]:
+                cell += 1
+
+        positions = self.positions
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Adjust the middle markers towards their desired positions
+        for i in range(1, 4):
+
+            offset = self.desired[i] - positions[i]
+
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or \
+                    (offset <= -1 and positions[i - 1] - positions[i] < -1):
+
+                step = 1 if offset > 0 else -1
+                height = self.parabolic(i, step)
+
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+
+                heights[i] = height
+                positions[i] += step
+
+    def parabolic(self, i, step):
+
+        heights, positions = self.heights, self.positions
+        return heights[i] + step / (positions[i + 1] - positions[i - 1]) * (
+            (positions[i] - positions[i - 1] + step) * (heights[i + 1] - heights[i]) / (positions[i + 1] - positions[i])
+            + (positions[i + 1] - positions[i] - step) * (heights[i] - heights[i - 1]) / (positions[i] - positions[i - 1]))
+
+    def value(self):
+
+        if not self.heights:
+            return math.nan
+
+        # With fewer than 5 values, use the nearest value
+        if len(self.heights) < 5:
+            return self.heights[min(len(self.heights) - 1, int(self.p * len(self.heights)))]
+
+        return self.heights[2]
+
+# Holds the streamed statistics of finished sessions
+
+
+class SessionStats():
+
+    def __init__(self, percentiles=(50, 90, 99)):
+        self.sessions = 0
+        self.user_ruined = 0
+        self.dealer_ruined = 0
+        self.unfinished = 0
+        self.length = RunningStats()
+        self.drawdown = RunningStats()
+        self.length_percentiles = {p: P2Quantile(p / 100) for p in percentiles}
+        self.drawdown_percentiles = {p: P2Quantile(p / 100) for p in percentiles}
+
+    # Adds a finished session, its number of rounds and its biggest drop in cents from the user's peak stack
+    def add(self, user_ruined, dealer_ruined, rounds, drawdown):
+
+        self.sessions += 1
+        self.user_ruined += user_ruined
+        self.dealer_ruined += dealer_ruined
+        self.unfinished += not (user_ruined or dealer_ruined)
+
+        self.length.add(rounds)
+        self.drawdown.add(drawdown)
+
+        for estimate in self.length_percentiles.values():
+            estimate.add(rounds)
+
+        for estimate in self.drawdown_percentiles.values():
+            estimate.add(drawdown)
+
+    # Probability that the user loses all of his stack
+    def ruin_probability(self):
+        return self.user_ruined / self.sessions
+
+    def __str__(self):
+
+        lines = [
+            f"{self.sessions} sessions, risk of ruin {self.ruin_probability():.4f}, "
+            f"dealer ruined {self.dealer_ruined / self.sessions:.4f}, unfinished {self.unfinished}",
+            f"Session length: mean {self.length.mean:.1f} rounds, std {self.length.std():.1f}, "
+            f"max {self.length.max:.0f}, "
+            + ", ".join(f"p{p} {estimate.value():.0f}" for p, estimate in self.length_percentiles.items()),
+            f"Max drawdown: mean ${format_dollars(round(self.drawdown.mean))}, "
+            + ", ".join(f"p{p} ${format_dollars(round(estimate.value()))}"
+                        for p, estimate in self.drawdown_percentiles.items()),
+        ]
+
+        return "\n".join(lines)
+
+# Plays n full sessions in batches of batch_size sessions at a time, and returns a SessionStats obj
+# Both stacks start at stack cents, and a session stops after max_rounds rounds if nobody is ruined
+# The rounds are played with the house rules of a RuleSet obj, the standard rules by default
+
+
+def simulate_sessions(n, stack=10000, bet_policy=flat_bet(100), seed=None, batch_size=10000,
+                      max_rounds=100000, stand_on=None, dealer_stand_on=None, rules=None):
+
+    rng = np.random.default_rng(seed)
+    stats = SessionStats()
+
+    while stats.sessions < n:
+
+        size = min(batch_size, n - stats.sessions)
+        user = np.full(size, stack, dtype=np.int64)
+        dealer = np.full(size, stack, dtype=np.int64)
+        peak = user.copy()
+        drawdown = np.zeros(size, dtype=np.int64)
+        rounds = np.zeros(size, dtype=np.int64)
+        active = np.arange(size)
+
+        while len(active):
+
+            # Play one round in every session that is still going
+            bets = np.minimum(bet_policy(user[active], dealer[active]), user[active])
+            multiplier, special = settle_rounds(deal_rounds(len(active), rng), stand_on, dealer_stand_on, rules)
+            payout = bets * multiplier
+
+            user[active] += payout
+            dealer[active] -= payout
+            rounds[active] += 1
+
+            peak[active] = np.maximum(peak[active], user[active])
+            drawdown[active] = np.maximum(drawdown[active], peak[active] - user[active])
+
+            # Record the sessions that ended
+            user_ruined = user[active] <= 0
+            dealer_ruined = dealer[active] <= 0
+            done = user_ruined | dealer_ruined | (rounds[active] >= max_rounds)
+
+            for i in np.nonzero(done)[0]:
+                session = active[i]
+                stats.add(bool(user_ruined[i]), bool(dealer_ruined[i]), int(rounds[session]),
+                          int(drawdown[session]))
+
+            active = active[~done]
+
+    return stats
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Simulate Chinese Blackjack sessions until a stack runs out.")
+    parser.add_argument("sessions", nargs="?", type=int, default=100000)
+    parser.add_argument("--stack", type=to_cents, default=10000, help="starting stack of both sides, in dollars")
+    parser.add_argument("--bet", type=to_cents, default=1000, help="flat bet per round, in dollars")
+    parser.add_argument("--fraction", type=float, help="bet this fraction of the user's stack instead")
+    parser.add_argument("--max-rounds", type=int, default=100000)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--rules", type=RuleSet.load, default=default_rules, metavar="PATH",
+                        help="JSON file of house rules")
+    args = parser.parse_args()
+
+    policy = proportional_bet(args.fraction) if args.fraction else flat_bet(args.bet)
+    print(simulate_sessions(args.sessions, args.stack, policy, args.seed, max_rounds=args.max_rounds,
+                            rules=args.rules))
@@ -0,0 +1,249 @@
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+
+from blackjack import (Card, CompactDeck, Deck, Player, check_hand_for_777, check_hand_for_aces, max_seats,
+                       play_round, play_table_round, stand_when_legal_policy)
+
+"""
+Benchmarks for the Chinese Blackjack rules hot paths and a full headless round
+Reports operations per second and bytes allocated per operation, and saves or compares JSON baselines
+"""
+
+# Each benchmark takes no arguments and returns the operation to time, after any set up it needs
+
+
+def bench_deck():
+
+    return Deck
+
+
+def bench_compact_deck():
+
+    return CompactDeck
+
+
+def bench_shuffle():
+
+    deck = Deck()
+    return deck.shuffle
+
+
+def bench_update_hand_values():
+
+    player = Player("Player", 0)
+    player.hand = [Card("Ace", "Spades"), Card("Seven", "Hearts"), Card("Five", "Clubs")]
+
+    return player.update_hand_values
+
+
+def bench_stand():
+
+    player = Player("Player", 0)
+    player.hand = [Card("Ace", "Spades"), Card("Seven", "Hearts"), Card("Five", "Clubs")]
+    player.update_hand_values()
+    return player.stand
+
+
+def bench_check_hand_for_aces():
+
+    hand = [Card("Ace", "Spades"), Card("Ace", "Hearts")]
+    return lambda: check_hand_for_aces(hand)
+
+
+def bench_check_hand_for_777():
+
+    hand = [Card("Seven", "Spades"), Card("Seven", "Hearts"), Card("Seven", "Clubs")]
+    return lambda: check_hand_for_777(hand)
+
+
+def bench_round():
+
+    # Includes building and shuffling the deck, as main() does every round
+    def operation():
+        deck = Deck()
+        deck.shuffle()
+        play_round(deck)
+
+    return operation
+
+
+def bench_table_round():
+
+    # A full table, each call plays one hand for every seat
+    policies = [stand_when_legal_policy] * max_seats
+
+    def operation():
+        deck = Deck()
+        deck.shuffle()
+        play_table_round(deck, policies)
+
+    return operation
+
+
+benchmarks = {
+    "Deck()": bench_deck,
+    "CompactDeck()": bench_compact_deck,
+    "Deck.shuffle": bench_shuffle,
+    "Player.update_hand_values": bench_update_hand_values,
+    "Player.stand": bench_stand,
+    "check_hand_for_aces": bench_check_hand_for_aces,
+    "check_hand_for_777": bench_check_hand_for_777,
+    "play_round": bench_round,
+    "play_table_round (7 seats)": bench_table_round,
+}
+
+# Times an operation and returns its operations per second, taking the best of a few repeats
+# Each repeat runs the operation enough times to take at least min_time seconds
+
+
+def ops_per_sec(operation, repeats=5, min_time=0.2):
+
+    # Find how many calls take at least min_time
+    calls = 1
+    while True:
+
+        start = time.perf_counter()
+        for i in range(calls):
+            operation()
+        elapsed = time.perf_counter() - start
+
+        if elapsed >= min_time:
+            break
+
+        calls *= 2
+
+    best = elapsed
+    for i in range(repeats - 1):
+
+        start = time.perf_counter()
+        for i in range(calls):
+            operation()
+        best = min(best, time.perf_counter() - start)
+
+    return calls / best
+
+# Returns the average number of bytes allocated by one call of the operation, at its peak
+
+
+def bytes_per_op(operation, calls=200):
+
+    tracemalloc.start()
+    total = 0
+
+    for i in range(calls):
+
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        operation()
+        total += tracemalloc.get_traced_memory()[1] - current
+
+    tracemalloc.stop()
+    return total / calls
+
+# Runs the benchmarks and returns a dict of {name: {"ops_per_sec": ..., "bytes_per_op": ...}}
+
+
+def run_benchmarks(names=None, repeats=5, min_time=0.2):
+
+    results = {}
+
+    for name, benchmark in benchmarks.items():
+
+        if names and name not in names:
+            continue
+
+        operation = benchmark()
+        results[name] = {
+            "ops_per_sec": ops_per_sec(operation, repeats, min_time),
+            "bytes_per_op": bytes_per_op(operation),
+        }
+
+    return results
+
+# Returns the current git commit, or None outside of a git checkout
+
+
+def git_commit():
+
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_baseline(path, results):
+
+    baseline = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+    with open(path, "w") as file:
+        json.dump(baseline, file, indent=2)
+
+# Compares results against a saved baseline and returns the names that got slower by more than threshold
+
+
+def compare(results, path, threshold=0.1):
+
+    with open(path) as file:
+        baseline = json.load(file)
+
+    print(f"Compared with baseline {path} (commit {baseline.get('commit')})")
+    regressions = []
+
+    for name, result in results.items():
+
+        if name not in baseline["results"]:
+            continue
+
+        before = baseline["results"][name]["ops_per_sec"]
+        change = result["ops_per_sec"] / before - 1
+        flag = ""
+
+        if change < -threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+
+        print(f"{name:<28} {before:>14,.0f} -> {result['ops_per_sec']:>14,.0f} ops/sec ({change:+.1%}){flag}")
+
+    return regressions
+
+
+def print_results(results):
+
+    print(f"{'benchmark':<28} {'ops/sec':>14} {'bytes/op':>10}")
+
+    for name, result in results.items():
+        print(f"{name:<28} {result['ops_per_sec']:>14,.0f} {result['bytes_per_op']:>10,.0f}")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark the Chinese Blackjack hot paths.")
+    parser.add_argument("names", nargs="*", help="benchmarks to run, all by default")
+    parser.add_argument("--save", metavar="PATH", help="save the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results with a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown that counts as a regression")
+    parser.add_argument("--quick", action="store_true", help="fewer and shorter repeats")
+    args = parser.parse_args()
+
+    if args.quick:
+        results = run_benchmarks(args.names, repeats=2, min_time=0.05)
+    else:
+        results = run_benchmarks(args.names)
+
+    print_results(results)
+
+    if args.save:
+        save_baseline(args.save, results)
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        raise SystemExit(1)
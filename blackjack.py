@@ -1,6 +1,10 @@
+import argparse
+import json
 import random
+import sys
 import time
-from decimal import Decimal, InvalidOperation, getcontext
+from array import array
+from decimal import Decimal, DecimalException, InvalidOperation
 
 """
 Chinese Blackjack game (1 human player vs 1 computer dealer)
@@ -26,17 +30,85 @@ class Card():
         self.suit = suit
         self.value = values[rank]
 
+    # Returns the shared card obj for a card int, used to display compact cards
+    @staticmethod
+    def from_int(card_int):
+        return card_objs[card_int]
+
+    # Returns the card int of this card, see card_ranks below
+    def to_int(self):
+        return suits.index(self.suit) * len(ranks) + ranks.index(self.rank)
+
     def __str__(self):
         return (f"{self.rank} of {self.suit} (Value: {self.value}).")
 
+
+# A card can also be stored as a small int from 0 to 51, in the same order as Deck() creates them
+# Its rank, suit and value are looked up by the card int in these tuples
+card_ranks = tuple(rank for suit in suits for rank in ranks)
+card_suits = tuple(suit for suit in suits for rank in ranks)
+card_values = tuple(values[rank] for rank in card_ranks)
+
+# One shared card obj per card int, only created once
+card_objs = tuple(Card(rank, suit) for rank, suit in zip(card_ranks, card_suits))
+
+# A random engine class that the decks are shuffled with, built on a random.Random obj
+# It can also hand out permutations one at a time from batches of batch_size permutations
+# The engine of the random module is used by default, pass RandomEngine(random.Random(seed)) to seed the shuffles
+# random_engines.py has the NumPy engines, which make a whole batch of permutations in one call
+
+
+class RandomEngine():
+
+    def __init__(self, source=None, batch_size=256):
+        self.source = source or random
+        self.batch_size = batch_size
+        self.batches = {}
+
+    # Returns n permutations of range(size)
+    def permutations(self, n, size=52):
+
+        permutations = []
+
+        for i in range(n):
+            permutation = list(range(size))
+            self.source.shuffle(permutation)
+            permutations.append(permutation)
+
+        return permutations
+
+    # Returns the next permutation of range(size) from the current batch, making a new batch once it runs out
+    def permutation(self, size=52):
+
+        batch = self.batches.get(size)
+
+        if not batch:
+            batch = self.batches[size] = list(self.permutations(self.batch_size, size))
+
+        return batch.pop()
+
+    # Shuffles a list or array of cards in place
+    def shuffle(self, cards):
+        self.source.shuffle(cards)
+
+    # Returns n engines with independent streams, e.g. one for each worker process
+    def spawn(self, n):
+        return [RandomEngine(random.Random(self.source.getrandbits(128)), self.batch_size) for i in range(n)]
+
+
+# The engine used when a deck is not given one
+default_engine = RandomEngine()
+
 # A deck class that contains 52 unique card objects
 # It has an all cards attribute that holds the 52 card objects
+# It is shuffled by its random engine, the default engine unless one is given
 
 
 class Deck():
 
-    def __init__(self):
+    def __init__(self, engine=None):
 
+        self.engine = engine or default_engine
         self.all_cards = []
 
         # For each suit in suit tuple
@@ -54,9 +126,131 @@ class Deck():
     # Deck shuffles itself
     def shuffle(self):
 
-        # The list of card objects is shuffled using the random module shuffle method
+        # The list of card objects is shuffled by the deck's random engine
         # The list is shuffled in place
-        random.shuffle(self.all_cards)
+        self.engine.shuffle(self.all_cards)
+
+    # Pops the last card (top of the deck) off the deck
+    def deal(self):
+        return self.all_cards.pop()
+
+# A compact deck class that holds the 52 cards as card ints in a byte array
+# It deals the shared card objs so it can be used in place of a Deck obj
+
+
+class CompactDeck():
+
+    def __init__(self, engine=None):
+        self.engine = engine or default_engine
+        self.all_cards = array("B", range(len(card_objs)))
+
+    # The byte array is shuffled in place
+    def shuffle(self):
+        self.engine.shuffle(self.all_cards)
+
+    # Pops the last card int (top of the deck) and returns its card obj
+    def deal(self):
+        return card_objs[self.all_cards.pop()]
+
+    # Pops the last card int (top of the deck) without creating a card obj
+    def deal_int(self):
+        return self.all_cards.pop()
+
+# Card counting value of each rank for the running count (Hi-Lo), low cards count +1 and high cards -1
+count_values = {
+    "Ace": -1, "Two": 1, "Three": 1, "Four": 1, "Five": 1, "Six": 1, "Seven": 0,
+    "Eight": 0, "Nine": 0, "Ten": -1, "Jack": -1, "Queen": -1, "King": -1
+}
+
+# A composition tracker class that keeps the number of cards left of each rank and the running count
+# Every dealt card updates it in constant time, so the cards left never have to be counted from the deck
+
+
+class CompositionTracker():
+
+    def __init__(self, num_decks=1):
+        self.num_decks = num_decks
+        self.reset()
+
+    # Puts every card back, e.g. on a reshuffle
+    def reset(self):
+        self.remaining = dict.fromkeys(ranks, 4 * self.num_decks)
+        self.cards_left = 52 * self.num_decks
+        self.running_count = 0
+
+    # Takes a dealt card's rank out of the cards left
+    def remove(self, rank):
+        self.remaining[rank] -= 1
+        self.cards_left -= 1
+        self.running_count += count_values[rank]
+
+    # Running count per deck left in the shoe
+    def true_count(self):
+        return self.running_count * 52 / max(self.cards_left, 1)
+
+    # Returns the cards left as a composition for probability.py and strategy.py, a tuple of the number
+    # of cards of each value class (Ace to Nine, then Ten, Jack, Queen and King together)
+    # Cards that were dealt but are still face down, e.g. the dealer's hole card, can be counted as left
+    def composition(self, hidden_cards=()):
+
+        remaining = self.remaining
+        composition = [remaining[rank] for rank in ranks[:9]]
+        composition.append(remaining["Ten"] + remaining["Jack"] + remaining["Queen"] + remaining["King"])
+
+        for card in hidden_cards:
+            composition[min(ranks.index(card.rank), 9)] += 1
+
+        return tuple(composition)
+
+# Most cards a hand can hold, a hand of 5 cards is a Wu Long
+max_hand_size = 5
+
+# A shoe class that holds one or more decks and deals across rounds
+# It is only reshuffled once the cut card is reached, at the penetration fraction of the shoe
+# The cut card is never placed so deep that a round at a table of seats seats could run out of cards
+# The cards left are tracked by a CompositionTracker obj as they are dealt
+
+
+class Shoe():
+
+    def __init__(self, num_decks=6, penetration=0.75, engine=None, seats=1):
+        self.num_decks = num_decks
+        self.engine = engine or default_engine
+
+        # All the cards of the shoe, kept to refill the shoe on reshuffle without rebuilding cards
+        self.cards = card_objs * num_decks
+
+        # Number of cards dealt before the shoe is reshuffled, leaving enough for every seat and the dealer
+        # to draw a full hand
+        self.cut_card = max(min(int(len(self.cards) * penetration), len(self.cards) - max_hand_size * (seats + 1)), 0)
+
+        self.tracker = CompositionTracker(num_decks)
+        self.shuffle()
+
+    # Puts all the cards back into the shoe and shuffles it
+    def shuffle(self):
+        self.all_cards = list(self.cards)
+        self.engine.shuffle(self.all_cards)
+
+        # Cards dealt since the last shuffle
+        self.cards_dealt = 0
+        self.tracker.reset()
+
+    # Pops the last card (top of the shoe) and takes it out of the tracked cards left
+    def deal(self):
+        card = self.all_cards.pop()
+        self.cards_dealt += 1
+        self.tracker.remove(card.rank)
+        return card
+
+    # Returns True if the cut card has been reached
+    def needs_shuffle(self):
+        return self.cards_dealt >= self.cut_card
+
+    # Reshuffles the shoe if the cut card has been reached, call this before each round
+    def start_round(self):
+        if self.needs_shuffle():
+            self.shuffle()
 
 # Function takes in a hand (list of cards) and checks for an ace
 
@@ -75,168 +269,381 @@ def check_hand_for_ace(list_of_cards):
     # Return false by default
     return False
 
-# A player class that has attributes of a name, stack, list of hand objs, and hand values
+# Function takes in a hand signature (number of aces, total of the non-ace cards, number of cards)
+# and returns the hand value, the hand value with ace and the legal hand value to stand on
+# The legal hand value is 0 if the hand is not legal to stand on
+# The ace values are (any hand, 2 card hand, 3 card hand), same as values["Ace"]
 
 
-class Player():
+def compute_hand_values(aces, non_ace_total, num_cards, ace_values=values["Ace"], stand_minimum=16):
+
+    # A single card hand with an ace has no value yet
+    if aces > 0 and num_cards < 2:
+        return (0, 0, 0)
+
+    # Aces count as 1 in the hand value
+    hand_value = non_ace_total + aces * ace_values[0]
+    hand_value_with_ace = 0
+
+    if aces > 0:
+
+        # If the number of cards in hand is 2, aces count as 11
+        if num_cards == 2:
+            hand_value_with_ace = non_ace_total + aces * ace_values[1]
+
+        # If the number of cards in hand is 3, aces count as 10
+        elif num_cards == 3:
+            hand_value_with_ace = non_ace_total + aces * ace_values[2]
+
+    # A hand is legal if it is the stand minimum (16) and above but 21 and below, take the higher legal value
+    legal_hands = [value for value in (hand_value, hand_value_with_ace) if stand_minimum <= value <= 21]
+    legal_hand_value = max(legal_hands, default=0)
+
+    return (hand_value, hand_value_with_ace, legal_hand_value)
+
+
+# A rule set class that holds the house rules: the payout of each special hand, the minimum hand value
+# to stand on and the ace values. It is compiled once into the lookup tables used to play and simulate,
+# so a rule set should not be changed after it is created, create a new RuleSet obj instead
 
-    def __init__(self, name, stack):
+
+class RuleSet():
+
+    def __init__(self, name="Standard", ban_ban=3, ban_luck=2, triple_seven=7, wu_long=2, busted_wu_long=2,
+                 stand_minimum=16, ace_values=values["Ace"]):
         self.name = name
-        self.stack = stack
-        self.hand = []
-        self.hand_value = 0
-        self.hand_value_with_ace = 0
-        self.final_hand_value = 0
+        self.stand_minimum = stand_minimum
+        self.ace_values = tuple(ace_values)
+
+        # Multiple of the bet won by whoever has the special hand, or lost with a busted Wu Long
+        self.payouts = {
+            "Ban Ban": ban_ban,
+            "Ban Luck": ban_luck,
+            "777": triple_seven,
+            "Wu Long": wu_long,
+            "Busted Wu Long": busted_wu_long,
+        }
+
+        # Lookup table of hand values for every hand signature of up to 5 cards
+        # Player.update_hand_values() falls back to compute_hand_values() for bigger hands
+        self.hand_value_table = {
+            (aces, non_ace_total, num_cards): self.compute_hand_values(aces, non_ace_total, num_cards)
+            for num_cards in range(6)
+            for aces in range(num_cards + 1)
+            for non_ace_total in range(2 * (num_cards - aces), 10 * (num_cards - aces) + 1)
+        }
+
+    def compute_hand_values(self, aces, non_ace_total, num_cards):
+        return compute_hand_values(aces, non_ace_total, num_cards, self.ace_values, self.stand_minimum)
+
+    # Returns the rules as a dict, in the same form a rules file holds them
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "ban_ban": self.payouts["Ban Ban"],
+            "ban_luck": self.payouts["Ban Luck"],
+            "triple_seven": self.payouts["777"],
+            "wu_long": self.payouts["Wu Long"],
+            "busted_wu_long": self.payouts["Busted Wu Long"],
+            "stand_minimum": self.stand_minimum,
+            "ace_values": list(self.ace_values),
+        }
+
+    # Saves the rules to a JSON file
+    def save(self, path):
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    # Loads the rules from a JSON file, any rule left out keeps its standard value
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            return cls(**json.load(file))
 
-    # Draws a card from the shuffled deck obj
-    def hit(self, deck_obj):
+    def __str__(self):
+        return self.name
 
-        # Pops the last item (top of the deck) off the shuffled deck obj
-        drawn_card = deck_obj.all_cards.pop()
+# Function loads the rule sets from a JSON file that holds either one rule set or a list of them
 
-        # Append it to player's hand, which is a list
-        self.hand.append(drawn_card)
 
-    # Prints the player's current hand to the terminal
-    def see_hand(self):
+def load_rule_sets(path):
 
-        print()
-        print(f"Player {self.name}'s hand holdings are: ")
-        print()
+    with open(path) as file:
+        rules = json.load(file)
 
-        time.sleep(0.5)
+    if isinstance(rules, dict):
+        rules = [rules]
 
-        # For each card in player instance's hand
-        for card in self.hand:
+    return [RuleSet(**rule) for rule in rules]
 
-            # Print out the card
-            print(card)
-            time.sleep(0.5)
 
-    # Update hand values for the player instance
-    def update_hand_values(self):
+# The standard house rules, used whenever no rule set is given
+default_rules = RuleSet()
+hand_value_table = default_rules.hand_value_table
+
+# Function takes in a hand of card ints and returns its hand values, same as Player.update_hand_values()
 
-        # Reset player instance's hand values and check for ace
-        self.hand_value = 0
-        self.hand_value_with_ace = 0
 
-        # Check if hand has an ace
-        if check_hand_for_ace(self.hand):
+def compact_hand_values(card_ints):
 
-            # If it does has an ace, check for the number of cards
-            # If the number of cards in hand is 2, apply respective ace values (1,11)
-            if len(self.hand) == 2:
+    aces = 0
+    non_ace_total = 0
 
-                # For each card in hand
-                for card in self.hand:
+    for card_int in card_ints:
 
-                    # If the card is an ace
-                    if card.rank == "Ace":
+        if card_ranks[card_int] == "Ace":
+            aces += 1
+        else:
+            non_ace_total += card_values[card_int]
 
-                        # Update hand with ace value with the card value of 11
-                        self.hand_value_with_ace += card.value[1]
+    signature = (aces, non_ace_total, len(card_ints))
+    return hand_value_table.get(signature) or compute_hand_values(*signature)
 
-                        # Update hand value with the card value of 1
-                        self.hand_value += card.value[0]
+# A display class that the game shows its messages and pauses through
+# The delay scale multiplies every pause, 1 for the normal game pace and 0 for no delays
 
-                    # Else the card is non-ace
-                    else:
 
-                        # Update hand value with the card value which holds ace value as 1
-                        self.hand_value += card.value
+class Display():
 
-                        # Update the second value which holds the ace value as 11
-                        self.hand_value_with_ace += card.value
+    def __init__(self, delay_scale=1):
+        self.delay_scale = delay_scale
 
-            # If the number of cards in hand is 3, apply respective ace values (1,10)
-            elif len(self.hand) == 3:
+    # Shows a message to the player, same arguments as print
+    def show(self, *args):
+        print(*args)
 
-                # For each card in hand
-                for card in self.hand:
+    # Pauses the game for the number of seconds, scaled by the delay scale
+    def pause(self, seconds=1):
+        if self.delay_scale > 0:
+            self.flush()
+            time.sleep(seconds * self.delay_scale)
 
-                    # If the card is an ace
-                    if card.rank == "Ace":
+    # Asks the player for input
+    def ask(self, prompt):
+        self.flush()
+        return input(prompt)
 
-                        # Update hand with ace value with the card value of 10
-                        self.hand_value_with_ace += card.value[2]
+    # Writes out any messages that have not been shown yet
+    def flush(self):
+        pass
 
-                        # Update hand value with the card value of 1
-                        self.hand_value += card.value[0]
+# A buffered display class that collects messages and writes them out together
+# Messages are written out before a pause, before asking for input, and when flushed
 
-                    # Else the card is non-ace
-                    else:
 
-                        # Update hand value with the card value which holds ace value as 1
-                        self.hand_value += card.value
+class BufferedDisplay(Display):
 
-                        # Update the second value which holds the ace value as 10
-                        self.hand_value_with_ace += card.value
+    def __init__(self, delay_scale=0, stream=None):
+        super().__init__(delay_scale)
+        self.stream = stream or sys.stdout
+        self.buffer = []
 
-            # If the number of cards in hand is 3 or more, apply respective ace values (1)
-            elif len(self.hand) > 3:
+    def show(self, *args):
+        self.buffer.append(" ".join(str(arg) for arg in args) + "\n")
 
-                # For each card in hand
-                for card in self.hand:
+    def flush(self):
+        if self.buffer:
+            self.stream.write("".join(self.buffer))
+            self.stream.flush()
+            self.buffer = []
 
-                    # If the card is an ace
-                    if card.rank == "Ace":
+# A silent display class that shows nothing and never pauses, input is still read
 
-                        # Update hand value with the card value of 1
-                        self.hand_value += card.value[0]
 
-                    # Else the card is non-ace
-                    else:
+class SilentDisplay(Display):
 
-                        # Update hand value with the card value which holds ace value as 1
-                        self.hand_value += card.value
+    def __init__(self):
+        super().__init__(delay_scale=0)
 
-        # Else there is no ace in hand
-        else:
+    def show(self, *args):
+        pass
 
-            # For each card in hand
-            for card in self.hand:
 
-                # Update hand value with the card's value
-                self.hand_value += card.value
+# Display used by the game when no display is given
+default_display = Display()
 
-    # Method chooses a legal hand (above 15 value) between 2 hand values
-    def stand(self):
+# Instrumentation that times the round phases, None when disabled, see metrics.py
+instrumentation = None
 
-        hand_values = [self.hand_value, self.hand_value_with_ace]
+# Largest amount in cents either way that to_cents() accepts
+max_cents = 10 ** 15
 
-        # Filters legal hand values and returns a list of legal hands
-        # A hand is legal if it is 16 and above but 21 and below
-        legal_hands = list(filter(lambda hand_value: 16 <=
-                           hand_value <= 21, hand_values))
+# Money is kept as a whole number of cents, so stacks, bets and payouts are exact
+# Function takes in a dollar amount, e.g. user input, and returns it in cents
+# Raises InvalidOperation if it is not a number, has fractions of a cent or is more than max_cents either way
 
-        # If there is no legal hands:
-        if len(legal_hands) == 0:
 
-            # Return false; ask user to continue drawing
-            return False
+def to_cents(amount):
 
-        # Else if there is only 1 legal hand
-        elif len(legal_hands) == 1:
+    try:
+        cents = Decimal(str(amount).strip()) * 100
+        whole = cents.is_finite() and abs(cents) <= max_cents and cents == cents.to_integral_value()
 
-            # Set player instance final hand value attribute to be that legal hand value
-            self.final_hand_value = legal_hands[0]
-            return True
+    # Overflow and the other decimal errors, not only InvalidOperation
+    except DecimalException:
+        whole = False
+
+    if not whole:
+        raise InvalidOperation(f"{amount} is not a whole number of cents")
+
+    return int(cents)
+
+# Function takes in an amount in cents and returns it as dollars for display, e.g. 1234.50
+
+
+def format_dollars(cents):
+
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+# A ledger class that takes the user's bet and settles it against the computer dealer
+# Stacks and bets are in cents, and a settlement multiplier is from the user's point of view
+# If a HistoryWriter obj is given, every settled round is appended to its hand history with the players' hands
+
+
+class Ledger():
+
+    def __init__(self, user, computer, history=None):
+        self.user = user
+        self.computer = computer
+        self.history = history
+        self.bet = 0
+
+    # Takes the bet out of the user's stack
+    def place_bet(self, bet):
+        self.user.bet(bet)
+        self.bet = bet
 
-        # Else if there is 2 legal hands
+    # Returns the user's bet with its winnings, or takes his losses, and returns the payout
+    # e.g. 3 for a Ban Ban win pays 3x the bet, -1 for a lost hand takes the bet, 0 returns the bet
+    def settle(self, multiplier):
+
+        if self.history is not None:
+            self.history.record_round(RoundOutcome(self.user, self.computer, self.bet, multiplier))
+
+        payout = self.bet * multiplier
+        self.user.stack += self.bet + payout
+        self.computer.stack -= payout
+        self.bet = 0
+        return payout
+
+# A player class that has attributes of a name, stack, list of hand objs, and hand values
+
+
+class Player():
+
+    def __init__(self, name, stack, rules=None):
+        self.name = name
+        self.stack = stack
+        self.rules = rules or default_rules
+        self.clear_hand()
+
+    # Empties the player's hand and resets the hand values
+    def clear_hand(self):
+        self.hand = []
+        self.hand_value = 0
+        self.hand_value_with_ace = 0
+        self.legal_hand_value = 0
+        self.final_hand_value = 0
+
+        # Running counts of the hand, updated on every hit
+        self.aces = 0
+        self.sevens = 0
+        self.non_ace_total = 0
+        self.num_cards = 0
+
+    # Draws a card from the shuffled deck obj
+    def hit(self, deck_obj):
+
+        # Pops the last item (top of the deck) off the shuffled deck obj
+        drawn_card = deck_obj.deal()
+
+        # Append it to player's hand, which is a list
+        self.hand.append(drawn_card)
+
+        # Update the running counts and hand values with the drawn card only
+        self.count_card(drawn_card)
+        self.look_up_hand_values()
+
+    # Adds a card to the running counts of the hand
+    def count_card(self, card):
+
+        if card.rank == "Ace":
+            self.aces += 1
         else:
+            self.non_ace_total += card.value
 
-            # Set instance attribute to have the higher value of the 2
-            if legal_hands[0] > legal_hands[1]:
+            if card.rank == "Seven":
+                self.sevens += 1
 
-                self.final_hand_value = legal_hands[0]
-                return True
+        self.num_cards += 1
 
-            else:
+    # Sets the hand values from the running counts
+    def look_up_hand_values(self):
 
-                self.final_hand_value = legal_hands[1]
-                return True
+        signature = (self.aces, self.non_ace_total, self.num_cards)
+        hand_values = self.rules.hand_value_table.get(signature) or self.rules.compute_hand_values(*signature)
+
+        self.hand_value, self.hand_value_with_ace, self.legal_hand_value = hand_values
+
+    # Returns True if there is an ace in hand
+    def has_ace(self):
+        return self.aces > 0
+
+    # Returns True if every card in hand is an ace, i.e. Ban Ban for a 2 card hand
+    def has_ban_ban(self):
+        return self.aces == self.num_cards
+
+    # Returns True if the hand is exactly 3 sevens
+    def has_777(self):
+        return self.num_cards == 3 and self.sevens == 3
+
+    # Prints the player's current hand to the terminal
+    def see_hand(self, display=None):
+
+        display = display or default_display
+
+        display.show()
+        display.show(f"Player {self.name}'s hand holdings are: ")
+        display.show()
+
+        display.pause(0.5)
+
+        # For each card in player instance's hand
+        for card in self.hand:
+
+            # Print out the card
+            display.show(card)
+            display.pause(0.5)
+
+    # Update hand values for the player instance
+    # Always recounts the hand, for hands set or changed without hit(), which keeps the counts up to date itself
+    def update_hand_values(self):
 
-    # Allows user to bet an amount, no min, max is all in
+        self.aces = 0
+        self.sevens = 0
+        self.non_ace_total = 0
+        self.num_cards = 0
+
+        for card in self.hand:
+            self.count_card(card)
+
+        self.look_up_hand_values()
+
+    # Method chooses a legal hand (above 15 value) between 2 hand values
+    def stand(self):
+
+        # If there is no legal hands:
+        if self.legal_hand_value == 0:
+
+            # Return false; ask user to continue drawing
+            return False
+
+        # Set player instance final hand value attribute to the higher legal hand value
+        self.final_hand_value = self.legal_hand_value
+        return True
+
+    # Allows user to bet an amount in cents, no min, max is all in
     def bet(self, amount):
 
         # Deduct the bet amount from the user's stack
@@ -244,7 +651,7 @@ class Player():
 
     # Shows how much user has left in his stack
     def __str__(self):
-        return f"Player {self.name} has a total of ${self.stack} dollars remaining."
+        return f"Player {self.name} has a total of ${format_dollars(self.stack)} dollars remaining."
 
 # Function takes in a list of 2 card objs and check if both have the attribute "rank" of "Ace"
 
@@ -293,10 +700,373 @@ def check_hand_for_777(list_of_cards):
     # Return false by default
     return False
 
+# A round outcome class that holds the result of a round played without any terminal input or output
+# The multiplier is from the player's point of view, e.g. 3 for a Ban Ban win and -2 for a dealer Ban Luck
+
+
+class RoundOutcome():
+
+    def __init__(self, player, dealer, bet, multiplier, special=None):
+        self.player_hand = player.hand
+        self.dealer_hand = dealer.hand
+        self.player_value = player.final_hand_value
+        self.dealer_value = dealer.final_hand_value
+        self.bet = bet
+        self.multiplier = multiplier
+        self.special = special
+
+        # The amount the player wins (positive) or loses (negative) on top of his bet
+        self.payout = bet * multiplier
+
+        # Winner of the round, None if it is a draw
+        if multiplier > 0:
+            self.winner = "Player"
+        elif multiplier < 0:
+            self.winner = "Computer"
+        else:
+            self.winner = None
+
+    def __str__(self):
+        special = f" ({self.special})" if self.special else ""
+        return (f"Player {self.player_value} vs dealer {self.dealer_value}{special}: "
+                f"{self.multiplier:+d}x bet, payout {self.payout}.")
+
+# Default player policy, hits until the hand is legal to stand and then stands
+# A player policy takes in the player and the dealer's face up card, and returns True to hit
+
+
+def stand_when_legal_policy(player, up_card):
+
+    return not player.stand()
+
+# Default dealer policy, the same rule the computer dealer uses in the game
+# A dealer policy takes in the dealer player, and returns True to hit
+
+
+def house_dealer_policy(dealer):
+
+    return not dealer.stand()
+
+# Returns a dealer policy that hits until the legal hand value reaches n, e.g. 17 to stand on 17 and above
+
+
+def hit_below_policy(n):
+
+    def policy(dealer):
+        return dealer.legal_hand_value < n
+
+    return policy
+
+# Returns a dealer policy that also hits on a soft n, a legal hand value of n that counts its aces as 10 or 11
+
+
+def hit_soft_policy(n=17):
+
+    def policy(dealer):
+        return dealer.legal_hand_value < n or (
+            dealer.legal_hand_value == n and dealer.hand_value_with_ace == n)
+
+    return policy
+
+# Returns a dealer policy that looks up whether to hit in a table
+# The table is a dict of {(legal hand value, soft): True to hit}, a hand that is not in it stands
+
+
+def table_dealer_policy(table):
+
+    def policy(dealer):
+        soft = dealer.hand_value_with_ace == dealer.legal_hand_value
+        return table.get((dealer.legal_hand_value, soft), False)
+
+    return policy
+
+# Plays one round of Chinese Blackjack without asking for input, printing or sleeping
+# Follows the same rules as main(), takes in a shuffled deck obj and returns a RoundOutcome obj
+# A policy can only stand on a legal hand, otherwise the player has to hit, same as in main()
+# If a HistoryWriter obj is given, the round is appended to its hand history
+# The round is played with the house rules of a RuleSet obj, the standard rules by default
+
+
+def play_round(deck_obj, player_policy=stand_when_legal_policy, dealer_policy=house_dealer_policy, bet=1,
+               history=None, rules=None):
+
+    steps = round_steps(deck_obj, dealer_policy, bet, rules)
+
+    try:
+        user, computer = next(steps)
+
+        # Hit if the policy wants to or if the hand is not legal to stand on
+        while True:
+            user, computer = steps.send(
+                player_policy(user, computer.hand[0]) or not user.legal_hand_value)
+
+    except StopIteration as round_over:
+        outcome = round_over.value
+
+    # Record the round in the hand history, see history.py
+    if history is not None:
+        history.record_round(outcome)
+
+    return outcome
+
+# Returns a generator that plays one round step by step, for callers that get the player's decisions
+# from elsewhere. It yields (user, computer) Player objs whenever the player has to decide, and is sent
+# True to hit or False to stand. Standing on a hand that is not legal yields again.
+# The generator returns the RoundOutcome obj when the round is done
+
+
+def round_steps(deck_obj, dealer_policy=house_dealer_policy, bet=1, rules=None):
+
+    return _round_steps(table_round_steps(deck_obj, 1, dealer_policy, (bet,), rules))
+
+
+def _round_steps(steps):
+
+    try:
+        seat, user, computer = next(steps)
+
+        while True:
+            hit = yield user, computer
+            seat, user, computer = steps.send(hit)
+
+    except StopIteration as round_over:
+        return round_over.value[0]
+
+# Most seats at a table, all playing against the one computer dealer
+max_seats = 7
+
+# Plays one round at a table of seats against the computer dealer, without asking for input, printing or sleeping
+# Takes in a player policy for each seat and a list of bets, and returns a list of RoundOutcome objs in seat order
+
+
+def play_table_round(deck_obj, player_policies, dealer_policy=house_dealer_policy, bets=None, rules=None):
+
+    bets = bets or [1] * len(player_policies)
+    steps = table_round_steps(deck_obj, len(player_policies), dealer_policy, bets, rules)
+
+    try:
+        seat, user, computer = next(steps)
+
+        # Hit if the seat's policy wants to or if the hand is not legal to stand on
+        while True:
+            seat, user, computer = steps.send(
+                player_policies[seat](user, computer.hand[0]) or not user.legal_hand_value)
+
+    except StopIteration as round_over:
+        return round_over.value
+
+# Returns a generator that plays one round at a table of num_seats seats step by step
+# It yields (seat, user, computer) whenever the player in a seat has to decide, with the seats playing in order,
+# and returns the list of RoundOutcome objs in seat order when the round is done
+
+
+def table_round_steps(deck_obj, num_seats=1, dealer_policy=house_dealer_policy, bets=None, rules=None):
+
+    if not 1 <= num_seats <= max_seats:
+        raise ValueError(f"A table has 1 to {max_seats} seats, not {num_seats}.")
+
+    bets = bets or [1] * num_seats
+    rules = rules or default_rules
+
+    # Only time the round phases when instrumentation is enabled, see metrics.py
+    if instrumentation is None:
+        return _table_round_steps(deck_obj, num_seats, dealer_policy, bets, rules, None)
+
+    return _instrumented_round_steps(deck_obj, num_seats, dealer_policy, bets, rules, instrumentation)
+
+
+# The round's phases are timed by its own RoundTimer obj, only the totals are shared by every round
+
+
+def _instrumented_round_steps(deck_obj, num_seats, dealer_policy, bets, rules, metrics):
+
+    timer = metrics.start_round()
+    outcomes = yield from _table_round_steps(deck_obj, num_seats, dealer_policy, bets, rules, timer)
+    timer.end_round()
+    return outcomes
+
+
+def _table_round_steps(deck_obj, num_seats, dealer_policy, bets, rules, timer):
+
+    seats = [Player("Player", 0, rules) for seat in range(num_seats)]
+    computer = Player("Computer dealer", 0, rules)
+    payouts = rules.payouts
+
+    # Deal 2 cards to every seat and then the computer, in one pass over the deck
+    for i in range(2):
+
+        for user in seats:
+            user.hit(deck_obj)
+
+        computer.hit(deck_obj)
+
+    if timer is not None:
+        timer.mark("special")
+
+    # Settle the seats with a Ban Ban or Ban Luck, or every seat if the computer has one
+    outcomes = [special_hand_outcome(user, computer, bets[seat], payouts) for seat, user in enumerate(seats)]
+    pending = [seat for seat in range(num_seats) if outcomes[seat] is None]
+
+    if not pending:
+        return outcomes
+
+    if timer is not None:
+        timer.mark("player")
+
+    for seat in pending:
+
+        user = seats[seat]
+
+        # Player's turn, while user's hand is not busted
+        while user.hand_value <= 21:
+
+            # If user has a hand value of 21, end his turn
+            if user.hand_value == 21:
+                user.stand()
+                break
+
+            # Stand if the player wants to and the hand is legal
+            hit = yield seat, user, computer
+
+            if not hit:
+
+                if user.stand():
+                    break
+
+                continue
+
+            user.hit(deck_obj)
+
+            # Checking for 777 instant victory condition
+            if user.has_777():
+                outcomes[seat] = RoundOutcome(user, computer, bets[seat], payouts["777"], "777")
+                break
+
+            # Check for Wu Long, busted or not
+            if user.num_cards == 5:
+
+                if user.hand_value > 21:
+                    outcomes[seat] = RoundOutcome(user, computer, bets[seat], -payouts["Busted Wu Long"],
+                                                  "Busted Wu Long")
+                else:
+                    outcomes[seat] = RoundOutcome(user, computer, bets[seat], payouts["Wu Long"], "Wu Long")
+
+                break
+
+            # Else if user hand is busted
+            elif user.hand_value > 21:
+                user.final_hand_value = user.hand_value
+
+    # The computer only plays if a seat is still waiting for him
+    pending = [seat for seat in pending if outcomes[seat] is None]
+
+    if not pending:
+        return outcomes
+
+    if timer is not None:
+        timer.mark("dealer")
+
+    # Computer's turn, played once for every seat
+    # Draws while the hand is not legal or the policy wants to hit
+    while not computer.stand() or dealer_policy(computer):
+
+        computer.hit(deck_obj)
+
+        # If hand busts or computer has a Wu Long hand, set attribute and exit loop
+        if computer.hand_value > 21 or computer.num_cards == 5:
+            computer.final_hand_value = computer.hand_value
+            break
+
+    if timer is not None:
+        timer.mark("settlement")
+
+    # Checking for the computer's 777 and Wu Long conditions, which settle every seat the same way
+    special = None
+
+    if computer.has_777():
+        special, multiplier = "777", -payouts["777"]
+
+    elif computer.num_cards == 5:
+
+        if computer.hand_value > 21:
+            special, multiplier = "Busted Wu Long", payouts["Busted Wu Long"]
+        else:
+            special, multiplier = "Wu Long", -payouts["Wu Long"]
+
+    # Settle the remaining seats against the computer's hand
+    for seat in pending:
+
+        if special is None:
+            multiplier = compare_hands(seats[seat], computer)
+
+        outcomes[seat] = RoundOutcome(seats[seat], computer, bets[seat], multiplier, special)
+
+    return outcomes
+
+# Returns the RoundOutcome obj of a seat's Ban Ban or Ban Luck, or the computer's, otherwise None
+# Takes in the payouts dict of a RuleSet obj
+
+
+def special_hand_outcome(user, computer, bet, payouts=default_rules.payouts):
+
+    # Check for Ban Ban
+    if user.has_ban_ban():
+
+        # Computer also has aces, it is a draw
+        if computer.has_ban_ban():
+            return RoundOutcome(user, computer, bet, 0, "Ban Ban")
+
+        return RoundOutcome(user, computer, bet, payouts["Ban Ban"], "Ban Ban")
+
+    elif computer.has_ban_ban():
+        return RoundOutcome(user, computer, bet, -payouts["Ban Ban"], "Ban Ban")
+
+    # Check for Ban Luck
+    if user.hand_value_with_ace == 21:
+
+        # Computer also has a ban luck, it is a draw
+        if computer.hand_value_with_ace == 21:
+            return RoundOutcome(user, computer, bet, 0, "Ban Luck")
+
+        return RoundOutcome(user, computer, bet, payouts["Ban Luck"], "Ban Luck")
+
+    elif computer.hand_value_with_ace == 21:
+        return RoundOutcome(user, computer, bet, -payouts["Ban Luck"], "Ban Luck")
+
+    return None
+
+# Returns the multiplier of a seat's final hand against the computer's, when neither has a special hand
+
+
+def compare_hands(user, computer):
+
+    # If the computer's hand busts, user wins unless his hand also busts
+    if computer.final_hand_value > 21:
+
+        if user.final_hand_value > 21:
+            return 0
+
+        return 1
+
+    # If the user's hand busts
+    if user.final_hand_value > 21:
+        return -1
+
+    # Compare hand values
+    if user.final_hand_value > computer.final_hand_value:
+        return 1
+
+    elif user.final_hand_value < computer.final_hand_value:
+        return -1
+
+    return 0
+
 # Ask user if they want to replay the game or not
 
 
-def replay():
+def replay(display=None):
+
+    display = display or default_display
 
     # Possible options
     yes = ["Y", "YES"]
@@ -308,7 +1078,7 @@ def replay():
     while to_play not in yes or to_play not in no:
 
         # Asking if user wants to play again
-        to_play = input("Do you wish to replay the game? (Y/N) ")
+        to_play = display.ask("Do you wish to replay the game? (Y/N) ")
 
         # If user wants to play the game
         if to_play.upper() in yes:
@@ -324,96 +1094,123 @@ def replay():
 
         # Inform user if they entered an invalid option
         else:
-            print()
-            print("You did not enter a valid option!")
-            print()
+            display.show()
+            display.show("You did not enter a valid option!")
+            display.show()
 
 # Chinese Blackjack game
+# Plays sessions one after another for as long as the user wants to replay
+# Each session's players, ledger and deck are let go when it returns, so a long running game does not grow
+# If a HistoryWriter obj is given, every session and round is appended to its hand history, see history.py
+
 
+def main(display=None, rules=None, history=None):
+
+    display = display or default_display
+    rules = rules or default_rules
+
+    while True:
+
+        play_session(display, rules, history)
+
+        # If user does not want to play the game again, quit the game
+        if not replay(display):
+            display.show("Thank you for playing!")
+            break
 
-def main():
+    # Write out the goodbye message, a buffered display would otherwise keep it
+    display.flush()
+
+# Plays one session, from asking the user's name and stack until the user or the computer dealer has no stack left
+# The payouts and the minimum hand value to stand on come from the RuleSet obj
+
+
+def play_session(display, rules=default_rules, history=None):
 
     # # Testing purposes
     # ace = Card("Ace", "Diamonds")
     # test_hand = [Card("Ten", "Clubs"), Card("Ten", "Diamonds")]
     # test_hand2 = [Card("Ten", "Hearts"), Card("Nine", "Spades")]
 
-    # Set floating decimal precision to 2
-    getcontext().prec = 2
-
     # Welcome message
-    print()
-    print("Welcome to Chinese BlackJack! (Ban Luck)")
-    print()
+    display.show()
+    display.show("Welcome to Chinese BlackJack! (Ban Luck)")
+    display.show()
 
     # Game rule message
-    print("Game rules:")
-    print("1. You will be playing against a single computer dealer player.")
-    print("2. The minimum bet per round is $1 and there is no maximum bet.")
-    print("3. Wu Long, Ban Luck, Ban Ban and Triple Seven multiplier rules applies.")
-    print("4. A card from the dealer is shown to the player.")
-    print()
+    display.show("Game rules:")
+    display.show("1. You will be playing against a single computer dealer player.")
+    display.show("2. The minimum bet per round is $1 and there is no maximum bet.")
+    display.show("3. Wu Long, Ban Luck, Ban Ban and Triple Seven multiplier rules applies.")
+    display.show("4. A card from the dealer is shown to the player.")
+    display.show()
 
     # Request user name
-    name = input("Please enter your name: ")
+    name = display.ask("Please enter your name: ")
 
     stack = None
     # While user input is not a number or if it is outside acceptable range
-    while type(stack) != Decimal or stack <= 0:
+    while type(stack) != int or stack <= 0:
 
-        stack = input("Please enter a dollar number for your starting stack: ")
+        stack = display.ask("Please enter a dollar number for your starting stack: ")
 
-        # Try to convert user input into a Decimal class
-        # Decimal class used to support floating point bets
+        # Try to convert user input into a whole number of cents
+        # Cents are used to support bets with dollars and cents
         try:
-            stack = Decimal(stack)
+            stack = to_cents(stack)
 
         # If user input is not a number, continue asking for user input
         except InvalidOperation:
-            print("Please enter a valid number!")
+            display.show("Please enter a valid number!")
             continue
 
         # If user did not input a positive number
         if stack <= 0:
-            print("You can't have a negative or zero stack!")
-            print()
+            display.show("You can't have a negative or zero stack!")
+            display.show()
             continue
 
     # Create user player and computer dealer Player objects
-    user = Player(name, stack)
-    computer = Player("Computer dealer", stack)
+    user = Player(name, stack, rules)
+    computer = Player("Computer dealer", stack, rules)
+    payouts = rules.payouts
+
+    # Ledger that takes the user's bets and pays out each round, and records them in the hand history
+    ledger = Ledger(user, computer, history)
+
+    if history is not None:
+        history.session(stack, stack)
+
+    # A single deck shoe that is reshuffled before every round
+    new_deck = Shoe(num_decks=1, penetration=0)
 
-    game_on = True
     turn = None
 
-    # While game is ongoing, and both players still have a stack
-    while game_on and (user.stack > 0 and computer.stack > 0):
+    # While both players still have a stack
+    while user.stack > 0 and computer.stack > 0:
 
         # Player goes first
         turn = "Player"
 
-        # Reconstruct the deck after each round
-        new_deck = Deck()
-
-        # Shuffle the deck
-        new_deck.shuffle()
+        # Reshuffle the deck after each round
+        new_deck.start_round()
 
         # Empty the player's and computer's hand
-        user.hand = []
-        computer.hand = []
+        user.clear_hand()
+        computer.clear_hand()
 
-        print()
-        print("Starting a new hand!")
-        time.sleep(1)
+        display.show()
+        display.show("Starting a new hand!")
+        display.pause()
 
-        print("Dealing cards...")
-        time.sleep(1)
+        display.show("Dealing cards...")
+        display.pause()
 
-        print()
-        print(computer)
-        time.sleep(1)
-        print(user)
-        time.sleep(1)
+        display.show()
+        display.show(computer)
+        display.pause()
+        display.show(user)
+        display.pause()
 
         # Deal 2 cards to the user and computer from deck
         for i in range(2):
@@ -424,154 +1221,132 @@ def main():
         while turn == "Player":
 
             # Ask for user's bet amount and deduct it from his stack
-            bet_amt = 0
+            bet_amt = None
 
             # While user input is not a number or if it is outside acceptable range
-            while type(bet_amt) != Decimal or bet_amt <= 0 or bet_amt > user.stack:
+            while type(bet_amt) != int or bet_amt <= 0 or bet_amt > user.stack:
 
-                bet_amt = input("Please enter a dollar number for your bet: ")
+                bet_amt = display.ask("Please enter a dollar number for your bet: ")
 
-                # Try to convert user input into a Decimal class
-                # Decimal class used to support floating point bets
+                # Try to convert user input into a whole number of cents
+                # Cents are used to support bets with dollars and cents
                 try:
-                    bet_amt = Decimal(bet_amt)
+                    bet_amt = to_cents(bet_amt)
 
                 # If user input is not a number, continue asking for user input
                 except InvalidOperation:
-                    print("Please enter a valid number!")
+                    display.show("Please enter a valid number!")
                     continue
 
                 # If user did not input a positive number
                 if bet_amt <= 0:
-                    print("You can't bet negative or zero dollars!")
+                    display.show("You can't bet negative or zero dollars!")
                     continue
 
                 if bet_amt > user.stack:
 
-                    print("You don't have enough chips to bet that amount!")
-                    print(f"You currently have ${user.stack} left.")
+                    display.show("You don't have enough chips to bet that amount!")
+                    display.show(f"You currently have ${format_dollars(user.stack)} left.")
                     continue
 
-            print(f"You have entered a bet of ${bet_amt}.")
-            time.sleep(1)
-            user.bet(bet_amt)
-            print(f"You have ${user.stack} left.")
-            time.sleep(1)
+            display.show(f"You have entered a bet of ${format_dollars(bet_amt)}.")
+            display.pause()
+            ledger.place_bet(bet_amt)
+            display.show(f"You have ${format_dollars(user.stack)} left.")
+            display.pause()
 
             # Testing
             # user.hand = test_hand
             # computer.hand = test_hand2
 
             # Show player one card from dealer
-            print()
-            print(f"The dealer's face up card is {computer.hand[0]}")
-            time.sleep(1)
+            display.show()
+            display.show(f"The dealer's face up card is {computer.hand[0]}")
+            display.pause()
 
             # Show player hand
-            user.see_hand()
+            user.see_hand(display)
 
             # Check to see if user has Aces
-            if check_hand_for_aces(user.hand):
+            if user.has_ban_ban():
 
-                print()
-                print("BAN BAN! (Pocket Rockets)")
-                time.sleep(1)
+                display.show()
+                display.show("BAN BAN! (Pocket Rockets)")
+                display.pause()
 
                 # If computer also don't have aces, user wins 3x his bet
-                if not check_hand_for_aces(computer.hand):
-
-                    print()
-                    print("You instantly win 3x your bet, congrats!")
-                    time.sleep(1)
+                if not computer.has_ban_ban():
 
-                    won_amt = bet_amt * 3
+                    display.show()
+                    display.show(f"You instantly win {payouts['Ban Ban']}x your bet, congrats!")
+                    display.pause()
 
-                    print(f"You win ${won_amt}.")
-                    time.sleep(1)
+                    won_amt = ledger.settle(payouts["Ban Ban"])
 
-                    # Update user stack
-                    user.stack = user.stack + bet_amt + won_amt
-
-                    # Update computer dealer stack
-                    computer.stack -= won_amt
+                    display.show(f"You win ${format_dollars(won_amt)}.")
+                    display.pause()
                     break
 
                 # Else if computer also has aces, it is a draw
-                elif check_hand_for_aces(computer.hand):
+                elif computer.has_ban_ban():
 
-                    print()
-                    print("Unlucky! The dealer also have Aces.")
-                    time.sleep(1)
-                    computer.see_hand()
-                    print("It is a draw!")
-                    time.sleep(1)
+                    display.show()
+                    display.show("Unlucky! The dealer also have Aces.")
+                    display.pause()
+                    computer.see_hand(display)
+                    display.show("It is a draw!")
+                    display.pause()
 
-                    # Update user stack
-                    user.stack += bet_amt
+                    # Return the user's bet
+                    ledger.settle(0)
                     break
 
             # Else if computer has aces, player lost 3x his bet amount
-            elif check_hand_for_aces(computer.hand):
-
-                print()
-                print("Unlucky! The dealer has aces!")
-                time.sleep(1)
-                computer.see_hand()
-                print("You lost 3x your bet.")
-                time.sleep(1)
-
-                lost_amt = bet_amt * 3
+            elif computer.has_ban_ban():
 
-                print(f"You lost ${lost_amt}.")
-                time.sleep(1)
+                display.show()
+                display.show("Unlucky! The dealer has aces!")
+                display.pause()
+                computer.see_hand(display)
+                display.show(f"You lost {payouts['Ban Ban']}x your bet.")
+                display.pause()
 
-                # Update user stack
-                user.stack = user.stack + bet_amt - lost_amt
+                lost_amt = -ledger.settle(-payouts["Ban Ban"])
 
-                # Update computer dealer stack
-                computer.stack += lost_amt
+                display.show(f"You lost ${format_dollars(lost_amt)}.")
+                display.pause()
                 break
 
-            # Player instance method update hand value instance attributes
-            user.update_hand_values()
-            computer.update_hand_values()
-
             # If user has a Ban Luck
             if user.hand_value_with_ace == 21:
 
-                print("Ban luck!")
-                time.sleep(1)
+                display.show("Ban luck!")
+                display.pause()
 
                 # If computer also has a ban luck
                 if computer.hand_value_with_ace == 21:
 
-                    print("Unlucky! The dealer also have Ban Luck.")
-                    time.sleep(1)
-                    computer.see_hand()
-                    print("It is a draw!")
-                    time.sleep(1)
+                    display.show("Unlucky! The dealer also have Ban Luck.")
+                    display.pause()
+                    computer.see_hand(display)
+                    display.show("It is a draw!")
+                    display.pause()
 
-                    # Update user stack
-                    user.stack += bet_amt
+                    # Return the user's bet
+                    ledger.settle(0)
                     break
 
                 # Else computer don't have a ban luck
                 else:
 
-                    print()
-                    print("You win 2x your bet, congrats!")
-                    time.sleep(1)
-
-                    won_amt = bet_amt * 2
-
-                    print(f"You win ${won_amt}.")
-                    time.sleep(1)
+                    display.show()
+                    display.show(f"You win {payouts['Ban Luck']}x your bet, congrats!")
+                    display.pause()
 
-                    # Update user stack
-                    user.stack = user.stack + bet_amt + won_amt
+                    won_amt = ledger.settle(payouts["Ban Luck"])
 
-                    # Update computer dealer stack
-                    computer.stack -= won_amt
+                    display.show(f"You win ${format_dollars(won_amt)}.")
+                    display.pause()
                     break
 
             # Else if user don't have a ban luck
@@ -580,46 +1355,40 @@ def main():
                 # If computer has ban luck
                 if computer.hand_value_with_ace == 21:
 
-                    print("Unlucky! The dealer have Ban Luck!")
-                    time.sleep(1)
-                    computer.see_hand()
+                    display.show("Unlucky! The dealer have Ban Luck!")
+                    display.pause()
+                    computer.see_hand(display)
 
-                    print("You lost 2x your bet.")
-                    time.sleep(1)
+                    display.show(f"You lost {payouts['Ban Luck']}x your bet.")
+                    display.pause()
 
-                    lost_amt = bet_amt * 2
+                    lost_amt = -ledger.settle(-payouts["Ban Luck"])
 
-                    print(f"You lost ${lost_amt}.")
-                    time.sleep(1)
-
-                    # Update user stack
-                    user.stack = user.stack + bet_amt - lost_amt
-
-                    # Update computer dealer stack
-                    computer.stack += lost_amt
+                    display.show(f"You lost ${format_dollars(lost_amt)}.")
+                    display.pause()
                     break
 
                 # Else both players don't have ban luck, it is a normal hand
                 else:
 
                     # If no ace is encountered
-                    if not check_hand_for_ace(user.hand):
+                    if not user.has_ace():
 
                         # Print to the user his hand value
-                        time.sleep(1)
-                        print()
-                        print(f"Your hand has a value of {user.hand_value}.")
-                        print()
+                        display.pause()
+                        display.show()
+                        display.show(f"Your hand has a value of {user.hand_value}.")
+                        display.show()
 
                     # Else ace is encountered
                     else:
 
                         # Print both possible values to the user
-                        time.sleep(1)
-                        print()
-                        print(f"Your hand has an Ace, with either a value of {user.hand_value} \
+                        display.pause()
+                        display.show()
+                        display.show(f"Your hand has an Ace, with either a value of {user.hand_value} \
 or {user.hand_value_with_ace}.")
-                        print()
+                        display.show()
 
             # While user's hand is not busted
             while user.hand_value <= 21:
@@ -632,14 +1401,14 @@ or {user.hand_value_with_ace}.")
                     break
 
                 # Ask the user if the user wants to hit or to stand
-                action = input("Hit or stand?: ")
+                action = display.ask("Hit or stand?: ")
 
                 # Clean user input
                 action = action.lower()
 
                 # Validate user input
                 if action not in ["hit", "stand", "h", "s"]:
-                    print(
+                    display.show(
                         """Sorry I don't understand! Please enter either "hit" or "stand".""")
                     continue
 
@@ -654,52 +1423,43 @@ or {user.hand_value_with_ace}.")
                     # user.hand.append(test_card)
 
                     # Print the drawn card
-                    time.sleep(1)
-                    print()
-                    print("Your drawn card is: ")
-                    time.sleep(1)
-                    print(f"{user.hand[-1]}")
-                    time.sleep(1)
-                    user.see_hand()
+                    display.pause()
+                    display.show()
+                    display.show("Your drawn card is: ")
+                    display.pause()
+                    display.show(f"{user.hand[-1]}")
+                    display.pause()
+                    user.see_hand(display)
 
                     # Checking for 777 instant victory condition
-                    if check_hand_for_777(user.hand):
-
-                        print()
-                        print("SEVEN SEVEN SEVEN")
-                        time.sleep(1)
-                        print("7 7 7!")
-                        time.sleep(1)
-                        print()
-                        print("Super lucky! You win 7x your bet, congrats!")
-                        time.sleep(1)
+                    if user.has_777():
 
-                        won_amt = bet_amt * 7
+                        display.show()
+                        display.show("SEVEN SEVEN SEVEN")
+                        display.pause()
+                        display.show("7 7 7!")
+                        display.pause()
+                        display.show()
+                        display.show(f"Super lucky! You win {payouts['777']}x your bet, congrats!")
+                        display.pause()
 
-                        print(f"You win ${won_amt}.")
-                        time.sleep(1)
+                        won_amt = ledger.settle(payouts["777"])
 
-                        # Update user stack
-                        user.stack = user.stack + bet_amt + won_amt
-
-                        # Update computer dealer stack
-                        computer.stack -= won_amt
+                        display.show(f"You win ${format_dollars(won_amt)}.")
+                        display.pause()
 
                         # Reset game
                         turn = None
                         break
 
-                    # Player method updates instance attributes that holds hand values
-                    user.update_hand_values()
-
                     # If no ace is encountered in the hand
-                    if not check_hand_for_ace(user.hand):
+                    if not user.has_ace():
 
                         # Print to the user his hand value
-                        time.sleep(1)
-                        print()
-                        print(f"Your hand has a value of {user.hand_value}.")
-                        print()
+                        display.pause()
+                        display.show()
+                        display.show(f"Your hand has a value of {user.hand_value}.")
+                        display.show()
 
                     # Else if an ace is encountered
                     else:
@@ -707,37 +1467,31 @@ or {user.hand_value_with_ace}.")
                         if len(user.hand) > 3:
 
                             # Print to the user his hand value
-                            time.sleep(1)
-                            print()
-                            print(
+                            display.pause()
+                            display.show()
+                            display.show(
                                 f"Your hand has a value of {user.hand_value}.")
-                            print()
+                            display.show()
 
                         else:
 
                             # Print both possible values to the user
-                            time.sleep(1)
-                            print()
-                            print(f"Your hand has an Ace, with either a value of {user.hand_value} \
+                            display.pause()
+                            display.show()
+                            display.show(f"Your hand has an Ace, with either a value of {user.hand_value} \
 or {user.hand_value_with_ace}.")
-                            print()
+                            display.show()
 
                     # If user has a busted Wu Long
                     if len(user.hand) == 5 and user.hand_value > 21:
 
-                        time.sleep(1)
-                        print("Busted Wu Long!")
-                        time.sleep(1)
-                        print("Unlucky, you lost 2x your bet.")
-                        time.sleep(1)
-
-                        lost_amt = bet_amt * 2
+                        display.pause()
+                        display.show("Busted Wu Long!")
+                        display.pause()
+                        display.show(f"Unlucky, you lost {payouts['Busted Wu Long']}x your bet.")
+                        display.pause()
 
-                        # Update user stack
-                        user.stack = user.stack + bet_amt - lost_amt
-
-                        # Update computer dealer stack
-                        computer.stack += lost_amt
+                        ledger.settle(-payouts["Busted Wu Long"])
 
                         # Reset hand
                         turn = None
@@ -746,21 +1500,15 @@ or {user.hand_value_with_ace}.")
                     # If user has a Wu Long
                     elif len(user.hand) == 5 and user.hand_value <= 21:
 
-                        time.sleep(1)
-                        print("Wu Long!")
-                        time.sleep(1)
-                        print("You win 2x your bet, congrats!")
-                        time.sleep(1)
-
-                        won_amt = bet_amt * 2
+                        display.pause()
+                        display.show("Wu Long!")
+                        display.pause()
+                        display.show(f"You win {payouts['Wu Long']}x your bet, congrats!")
+                        display.pause()
 
-                        print(f"You win ${won_amt}.")
+                        won_amt = ledger.settle(payouts["Wu Long"])
 
-                        # Update user stack
-                        user.stack = user.stack + bet_amt + won_amt
-
-                        # Update computer dealer stack
-                        computer.stack -= won_amt
+                        display.show(f"You win ${format_dollars(won_amt)}.")
 
                         # Reset hand
                         turn = None
@@ -769,9 +1517,9 @@ or {user.hand_value_with_ace}.")
                     # Else if user hand is busted
                     elif user.hand_value > 21:
 
-                        time.sleep(1)
-                        print("Your hand value exceeds 21. Your hand is busted!")
-                        time.sleep(1)
+                        display.pause()
+                        display.show("Your hand value exceeds 21. Your hand is busted!")
+                        display.pause()
 
                         user.final_hand_value = user.hand_value
 
@@ -786,19 +1534,19 @@ or {user.hand_value_with_ace}.")
                     if not user.stand():
 
                         # Go through loop and ask user to hit and draw
-                        time.sleep(1)
-                        print("You don't have a hand value that is legal!")
-                        time.sleep(1)
-                        print("The minimum point to stand is 16.")
-                        time.sleep(1)
-                        print("Please hit and draw until your hand is legal.")
+                        display.pause()
+                        display.show("You don't have a hand value that is legal!")
+                        display.pause()
+                        display.show(f"The minimum point to stand is {rules.stand_minimum}.")
+                        display.pause()
+                        display.show("Please hit and draw until your hand is legal.")
                         continue
 
                     else:
 
-                        time.sleep(1)
-                        print(f"Your hand's value is {user.final_hand_value}.")
-                        time.sleep(1)
+                        display.pause()
+                        display.show(f"Your hand's value is {user.final_hand_value}.")
+                        display.pause()
 
                         # Change turn to user
                         turn = "Computer"
@@ -807,17 +1555,16 @@ or {user.hand_value_with_ace}.")
         # While it is computer's turn
         while turn == "Computer":
 
-            print()
-            time.sleep(1)
-            print("It is the computer dealer's turn!")
+            display.show()
+            display.pause()
+            display.show("It is the computer dealer's turn!")
 
             # while dealer's hand is not legal, draw till legal
             while not computer.stand():
 
                 computer.hit(new_deck)
-                time.sleep(1)
-                print("Computer dealer draws...")
-                computer.update_hand_values()
+                display.pause()
+                display.show("Computer dealer draws...")
 
                 # If hand busts, set attribute and exit loop
                 if computer.hand_value > 21:
@@ -838,39 +1585,33 @@ or {user.hand_value_with_ace}.")
             # computer.update_hand_values()
             # computer.stand()
 
-            print()
-            time.sleep(1)
-            print("Showdown!")
-            time.sleep(1)
-            computer.see_hand()
-            time.sleep(1)
-            print(
+            display.show()
+            display.pause()
+            display.show("Showdown!")
+            display.pause()
+            computer.see_hand(display)
+            display.pause()
+            display.show(
                 f"The computer dealer's hand value is {computer.final_hand_value}.")
-            time.sleep(1)
+            display.pause()
 
             # Checking for 777 instant victory conditions
-            if check_hand_for_777(computer.hand):
-
-                print()
-                print("SEVEN SEVEN SEVEN")
-                time.sleep(1)
-                print("7 7 7!")
-                time.sleep(1)
-                print("The dealer has 777")
-                print()
-                print("Super unlucky! You lost 7x your bet.")
-                time.sleep(1)
-
-                lost_amt = bet_amt * 7
+            if computer.has_777():
 
-                print(f"You lost ${lost_amt}.")
-                time.sleep(1)
+                display.show()
+                display.show("SEVEN SEVEN SEVEN")
+                display.pause()
+                display.show("7 7 7!")
+                display.pause()
+                display.show("The dealer has 777")
+                display.show()
+                display.show(f"Super unlucky! You lost {payouts['777']}x your bet.")
+                display.pause()
 
-                # Update user stack
-                user.stack = user.stack + bet_amt - lost_amt
+                lost_amt = -ledger.settle(-payouts["777"])
 
-                # Update computer dealer stack
-                computer.stack += lost_amt
+                display.show(f"You lost ${format_dollars(lost_amt)}.")
+                display.pause()
 
                 # Reset game
                 turn = None
@@ -882,21 +1623,15 @@ or {user.hand_value_with_ace}.")
                 # If computer has a busted Wu Long
                 if computer.hand_value > 21:
 
-                    time.sleep(1)
-                    print("Busted Wu Long!")
-                    time.sleep(1)
-                    print("Lucky! You win 2x your bet.")
-                    time.sleep(1)
+                    display.pause()
+                    display.show("Busted Wu Long!")
+                    display.pause()
+                    display.show(f"Lucky! You win {payouts['Busted Wu Long']}x your bet.")
+                    display.pause()
 
-                    won_amt = bet_amt * 2
+                    won_amt = ledger.settle(payouts["Busted Wu Long"])
 
-                    print(f"You win ${won_amt}.")
-
-                    # Update user stack
-                    user.stack = user.stack + bet_amt + won_amt
-
-                    # Update computer dealer stack
-                    computer.stack -= won_amt
+                    display.show(f"You win ${format_dollars(won_amt)}.")
 
                     # Reset hand
                     turn = None
@@ -905,20 +1640,14 @@ or {user.hand_value_with_ace}.")
                 # Else if the dealer has a valid Wu Long
                 else:
 
-                    print("The dealer has Wu Long!")
-                    time.sleep(1)
-                    print("Unlucky, you lost 2x your bet.")
-                    time.sleep(1)
-
-                    lost_amt = bet_amt * 2
+                    display.show("The dealer has Wu Long!")
+                    display.pause()
+                    display.show(f"Unlucky, you lost {payouts['Wu Long']}x your bet.")
+                    display.pause()
 
-                    print(f"You lost ${lost_amt}.")
+                    lost_amt = -ledger.settle(-payouts["Wu Long"])
 
-                    # Update user stack
-                    user.stack = user.stack + bet_amt - lost_amt
-
-                    # Update computer dealer stack
-                    computer.stack += lost_amt
+                    display.show(f"You lost ${format_dollars(lost_amt)}.")
 
                     # Reset hand
                     turn = None
@@ -927,22 +1656,22 @@ or {user.hand_value_with_ace}.")
             # If the computer's hand busts
             if computer.final_hand_value > 21:
 
-                print("The computer's hand is busted!")
-                time.sleep(1)
+                display.show("The computer's hand is busted!")
+                display.pause()
 
-                user.see_hand()
-                print(f"Your hand value is {user.final_hand_value}.")
-                time.sleep(1)
+                user.see_hand(display)
+                display.show(f"Your hand value is {user.final_hand_value}.")
+                display.pause()
 
                 # If the user's hand also busts
                 if user.final_hand_value > 21:
 
-                    print("Your hand is also busted!")
-                    time.sleep(1)
-                    print("It is a draw.")
+                    display.show("Your hand is also busted!")
+                    display.pause()
+                    display.show("It is a draw.")
 
-                    # Reset stack
-                    user.stack += bet_amt
+                    # Return the user's bet
+                    ledger.settle(0)
 
                     # Reset game
                     turn = None
@@ -951,14 +1680,13 @@ or {user.hand_value_with_ace}.")
                 # Else if the user's hand is legal
                 else:
 
-                    print("You win the hand!")
-                    time.sleep(1)
+                    display.show("You win the hand!")
+                    display.pause()
 
-                    print(f"You win ${bet_amt}.")
+                    display.show(f"You win ${format_dollars(bet_amt)}.")
 
-                    # Update stack
-                    user.stack += bet_amt + bet_amt
-                    computer.stack -= bet_amt
+                    # Update stacks
+                    ledger.settle(1)
 
                     # Reset game
                     turn = None
@@ -967,21 +1695,21 @@ or {user.hand_value_with_ace}.")
             # Else the computer's hand is not busted
             else:
 
-                user.see_hand()
-                print(f"Your hand value is {user.final_hand_value}.")
-                time.sleep(1)
+                user.see_hand(display)
+                display.show(f"Your hand value is {user.final_hand_value}.")
+                display.pause()
 
                 # If the user's hand busts
                 if user.final_hand_value > 21:
 
-                    print("Your hand is busted!")
-                    time.sleep(1)
-                    print("You lost the hand.")
-                    time.sleep(1)
-                    print(f"You lost ${bet_amt}.")
+                    display.show("Your hand is busted!")
+                    display.pause()
+                    display.show("You lost the hand.")
+                    display.pause()
+                    display.show(f"You lost ${format_dollars(bet_amt)}.")
 
                     # Update stacks
-                    computer.stack += bet_amt
+                    ledger.settle(-1)
 
                     # Reset game
                     turn = None
@@ -994,15 +1722,14 @@ or {user.hand_value_with_ace}.")
                     # If user wins
                     if user.final_hand_value > computer.final_hand_value:
 
-                        print("You win the hand!")
-                        time.sleep(1)
+                        display.show("You win the hand!")
+                        display.pause()
 
-                        print(f"You win ${bet_amt}.")
-                        time.sleep(1)
+                        display.show(f"You win ${format_dollars(bet_amt)}.")
+                        display.pause()
 
-                        # Update stack
-                        user.stack += bet_amt + bet_amt
-                        computer.stack -= bet_amt
+                        # Update stacks
+                        ledger.settle(1)
 
                         # Reset game
                         turn = None
@@ -1011,14 +1738,14 @@ or {user.hand_value_with_ace}.")
                     # Else if user loses
                     elif user.final_hand_value < computer.final_hand_value:
 
-                        print("You lost the hand.")
-                        time.sleep(1)
+                        display.show("You lost the hand.")
+                        display.pause()
 
-                        print(f"You lost ${bet_amt}.")
-                        time.sleep(1)
+                        display.show(f"You lost ${format_dollars(bet_amt)}.")
+                        display.pause()
 
-                        # Update stack
-                        computer.stack += bet_amt
+                        # Update stacks
+                        ledger.settle(-1)
 
                         # Reset game
                         turn = None
@@ -1027,11 +1754,11 @@ or {user.hand_value_with_ace}.")
                     # Else if both final hand values are equal
                     else:
 
-                        print("It is a draw!")
-                        time.sleep(1)
+                        display.show("It is a draw!")
+                        display.pause()
 
-                        # Update stack
-                        user.stack += bet_amt
+                        # Return the user's bet
+                        ledger.settle(0)
 
                         # Reset game
                         turn = None
@@ -1040,41 +1767,40 @@ or {user.hand_value_with_ace}.")
         # If user lost all of his money
         if user.stack <= 0:
 
-            print(user)
-            time.sleep(1)
-            print("You have lost all of your stack!")
-            time.sleep(1)
-
-            # If user wants to play the game again, re-run the program
-            if replay():
-                main()
-
-            else:
-                game_on = False
-                print("Thank you for playing!")
-                break
+            display.show(user)
+            display.pause()
+            display.show("You have lost all of your stack!")
+            display.pause()
+            break
 
         # If computer lost all of his money
         if computer.stack <= 0:
 
-            print(computer)
-            time.sleep(1)
-            print("The computer dealer has lost all of his stack!")
-            time.sleep(1)
-            print("Congratulations, you win the game.")
-            time.sleep(1)
-
-            # If user wants to play the game again, re-run the program
-            if replay():
-                main()
-
-            else:
-                game_on = False
-                print("Thank you for playing!")
-                break
+            display.show(computer)
+            display.pause()
+            display.show("The computer dealer has lost all of his stack!")
+            display.pause()
+            display.show("Congratulations, you win the game.")
+            display.pause()
+            break
 
 
 # If this module is run under Python interpreter, __name__ is set '__main__' by the Python interpreter.
 # tldr: If this script is ran from this script, call the main function
 if __name__ == "__main__":
-    main()
+
+    parser = argparse.ArgumentParser(description="Play Chinese Blackjack against the computer dealer.")
+    parser.add_argument("--fast", action="store_true", help="play without any pauses")
+    parser.add_argument("--rules", type=RuleSet.load, default=default_rules, metavar="PATH",
+                        help="JSON file of house rules")
+    parser.add_argument("--history", metavar="PATH", help="append the hand history to a log file, see history.py")
+    args = parser.parse_args()
+
+    display = Display(delay_scale=0) if args.fast else None
+
+    if args.history:
+        from history import HistoryWriter
+        with HistoryWriter(args.history) as history:
+            main(display, args.rules, history)
+    else:
+        main(display, args.rules)
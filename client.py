@@ -0,0 +1,152 @@
+import argparse
+import asyncio
+import time
+
+"""
+Chinese Blackjack (Ban Luck) client for server.py
+Plays at a table from the terminal, or runs a load generator that plays many tables at once
+"""
+
+# Reply lines that end a reply from the server
+last_reply_lines = ("WELCOME", "TURN", "RESULT", "GAMEOVER", "ERR", "BYE")
+
+# Reads one reply from the server and returns its lines
+
+
+async def read_reply(reader):
+
+    lines = []
+
+    while True:
+
+        line = (await reader.readline()).decode().strip()
+
+        # The server closed the connection
+        if not line:
+            return lines
+
+        lines.append(line)
+        command, _, rest = line.partition(" ")
+
+        if command in last_reply_lines:
+
+            # A RESULT that takes the player's or the house's stack to zero is followed by GAMEOVER
+            if command == "RESULT" and min(float(stack) for stack in rest.split()[3:5]) <= 0:
+                continue
+
+            return lines
+
+# Sends a command to the server and returns the lines of its reply
+
+
+async def send(reader, writer, command):
+
+    writer.write(f"{command}\n".encode())
+    await writer.drain()
+    return await read_reply(reader)
+
+# Plays at a table from the terminal
+
+
+async def play(host, port):
+
+    loop = asyncio.get_running_loop()
+    reader, writer = await asyncio.open_connection(host, port)
+
+    for line in await read_reply(reader):
+        print(line)
+
+    print("Commands: BET <amount>, HIT, STAND, QUIT")
+
+    while True:
+
+        command = await loop.run_in_executor(None, input, "> ")
+        lines = await send(reader, writer, command.strip())
+
+        for line in lines:
+            print(line)
+
+        if not lines or lines[-1] in ("BYE", "GAMEOVER"):
+            break
+
+    writer.close()
+
+# Plays rounds at one table, hitting until the hand is legal and then standing
+# Appends the latency of every action in seconds to latencies and returns the number of rounds played
+
+
+async def play_table(host, port, rounds, bet, latencies):
+
+    reader, writer = await asyncio.open_connection(host, port)
+    await read_reply(reader)
+    played = 0
+
+    for i in range(rounds):
+
+        command = f"BET {bet}"
+
+        while command:
+
+            start = time.perf_counter()
+            lines = await send(reader, writer, command)
+            latencies.append(time.perf_counter() - start)
+
+            # Leave the table once the stack is lost or too small for the bet
+            if not lines or lines[-1].startswith("ERR"):
+                writer.close()
+                return played
+
+            if lines[-1] == "GAMEOVER":
+                writer.close()
+                return played + 1
+
+            # Hit until the legal hand value is above 0, then stand
+            if lines[-1].startswith("TURN"):
+                legal_hand_value = int(lines[-1].split()[3])
+                command = "STAND" if legal_hand_value else "HIT"
+            else:
+                command = None
+
+        played += 1
+
+    await send(reader, writer, "QUIT")
+    writer.close()
+    return played
+
+# Plays rounds at many tables at once and prints the rounds per second and action latencies
+
+
+async def load_test(host, port, tables, rounds, bet):
+
+    latencies = []
+    start = time.perf_counter()
+
+    played = await asyncio.gather(*(play_table(host, port, rounds, bet, latencies) for i in range(tables)))
+
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    # Returns the latency at the given percentile in milliseconds
+    def percentile(p):
+        return 1000 * latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+    print(f"{tables} tables played {sum(played)} rounds in {elapsed:.2f} seconds "
+          f"({sum(played) / elapsed:.0f} rounds/sec).")
+    print(f"{len(latencies)} actions, latency p50 {percentile(50):.2f} ms, "
+          f"p99 {percentile(99):.2f} ms, max {1000 * latencies[-1]:.2f} ms.")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Play Chinese Blackjack on a server.py server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--load", type=int, metavar="TABLES", help="run the load generator with this many tables")
+    parser.add_argument("--rounds", type=int, default=100, help="rounds per table for the load generator")
+    parser.add_argument("--bet", default="1", help="bet per round for the load generator")
+    args = parser.parse_args()
+
+    if args.load:
+        asyncio.run(load_test(args.host, args.port, args.load, args.rounds, args.bet))
+    else:
+        asyncio.run(play(args.host, args.port))
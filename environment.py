@@ -0,0 +1,271 @@
+import random
+
+import numpy as np
+
+from blackjack import RandomEngine, Shoe, count_values, default_rules, house_dealer_policy, ranks, round_steps
+from simulation import (BUSTED_WU_LONG, NONE, TRIPLE_SEVEN, WU_LONG, Hands, cards_per_round, dealer_turn,
+                        settle_against_dealer, settle_special_hands)
+
+"""
+Step and reset environments for training agents to play Chinese Blackjack (Ban Luck)
+BanLuckEnv plays one table with the game's Player rules, VectorBanLuckEnv steps many tables at once as NumPy arrays
+
+An observation is (hand signature, dealer up card, card count)
+    hand signature      (number of aces, total of the non-ace cards, number of cards)
+    dealer up card      rank index of the dealer's face up card, 0 for the Ace to 12 for the King
+    card count          running count of the cards the player has seen since the shoe was shuffled
+An action is HIT or STAND, standing on a hand that is not legal hits instead, same as play_round()
+The reward is the player's payout multiplier at the end of a round, and 0 before that
+The observation at the end of a round is of the settled round, the player's final hand and a count of every card
+dealt in it, the dealer's hole card and draws included
+
+Rounds settled on the deal by a Ban Ban or Ban Luck need no decision, so reset() deals again until a round does
+Their number and payouts are returned in the info dict as settled_rounds and settled_reward,
+add them in when measuring the agent's EV
+"""
+
+STAND, HIT = 0, 1
+
+# Card counting value of each rank index, see count_values in blackjack.py
+rank_count_values = np.array([count_values[rank] for rank in ranks], dtype=np.int64)
+
+# An environment class that plays rounds of one table from a shoe, with the same rules as play_round()
+# The shoe is shuffled by its own seeded random engine when a seed is given
+
+
+class BanLuckEnv():
+
+    def __init__(self, num_decks=1, penetration=0.75, rules=None, dealer_policy=house_dealer_policy, seed=None):
+        engine = RandomEngine(random.Random(seed)) if seed is not None else None
+        self.shoe = Shoe(num_decks, penetration, engine)
+        self.rules = rules or default_rules
+        self.dealer_policy = dealer_policy
+        self.round = None
+
+    # Starts a new round and returns (observation, info)
+    def reset(self):
+
+        settled_rounds = settled_reward = 0
+
+        # Deal until a round needs a decision
+        while True:
+
+            self.shoe.start_round()
+            self.round = round_steps(self.shoe, self.dealer_policy, 1, self.rules)
+
+            try:
+                self.user, self.computer = next(self.round)
+                return self.observation(), {"settled_rounds": settled_rounds, "settled_reward": settled_reward}
+
+            except StopIteration as round_over:
+                settled_rounds += 1
+                settled_reward += round_over.value.multiplier
+
+    # Plays an action and returns (observation, reward, done, info)
+    # Once done, reset() has to be called to start the next round
+    def step(self, action):
+
+        hit = action == HIT or not self.user.legal_hand_value
+
+        try:
+            self.user, self.computer = self.round.send(hit)
+            return self.observation(), 0, False, {}
+
+        except StopIteration as round_over:
+            self.round = None
+            outcome = round_over.value
+            return self.observation(outcome), outcome.multiplier, True, {"outcome": outcome}
+
+    # Observes the round in progress, or the settled round of a RoundOutcome obj with every card face up
+    def observation(self, outcome=None):
+
+        if outcome is not None:
+
+            hand = outcome.player_hand
+            aces = sum(card.rank == "Ace" for card in hand)
+            non_ace_total = sum(card.value for card in hand if card.rank != "Ace")
+
+            return ((aces, non_ace_total, len(hand)), ranks.index(outcome.dealer_hand[0].rank),
+                    self.shoe.tracker.running_count)
+
+        user = self.user
+        count = self.shoe.tracker.running_count
+
+        # The dealer's hole card is only seen once the round is over
+        if self.round is not None:
+            count -= count_values[self.computer.hand[1].rank]
+
+        return ((user.aces, user.non_ace_total, user.num_cards), ranks.index(self.computer.hand[0].rank), count)
+
+# A vectorized environment class that steps num_envs independent tables at once, each with its own shoe
+# The computer dealer stands once his legal hand value reaches dealer_stand_on, the rule set's stand minimum
+# by default. Tables that finish a round start the next one in the same step
+
+
+class VectorBanLuckEnv():
+
+    def __init__(self, num_envs, num_decks=1, penetration=0.75, rules=None, dealer_stand_on=None, seed=None):
+        self.num_envs = num_envs
+        self.rules = rules or default_rules
+        self.dealer_stand_on = dealer_stand_on or self.rules.stand_minimum
+        self.rng = np.random.default_rng(seed)
+
+        # Each shoe is a row of rank indexes, dealt from position onwards
+        # A shoe is reshuffled at the start of a round once the cut card is reached, or too few cards are left
+        self.shoe_size = 52 * num_decks
+        self.cut_card = min(int(self.shoe_size * penetration), self.shoe_size - cards_per_round)
+        self.shoes = np.zeros((num_envs, self.shoe_size), dtype=np.int8)
+        self.position = np.zeros(num_envs, dtype=np.int64)
+
+        # Running count of the shoe before the current round, and with the cards the player has seen in it
+        self.count = np.zeros(num_envs, dtype=np.int64)
+        self.seen_count = np.zeros(num_envs, dtype=np.int64)
+        self.round_start = np.zeros(num_envs, dtype=np.int64)
+
+        self.up_rank = np.zeros(num_envs, dtype=np.int8)
+        no_cards = np.zeros(num_envs, dtype=np.int8)
+        self.user = Hands(no_cards, no_cards, self.rules)
+        self.computer = Hands(no_cards, no_cards, self.rules)
+
+        self.shuffle(np.ones(num_envs, dtype=bool))
+
+    # Shuffles the shoes selected by the mask, a shuffle is the argsort of random float64 keys, see simulation.deal_rounds()
+    def shuffle(self, mask):
+
+        rows = np.nonzero(mask)[0]
+        keys = self.rng.random((len(rows), self.shoe_size))
+
+        self.shoes[rows] = np.argsort(keys, axis=1) % 13
+        self.position[rows] = 0
+        self.count[rows] = 0
+
+    # Deals the next card of the shoes selected by the mask, and returns the rank indexes of every shoe's next card
+    def deal(self, mask):
+
+        drawn_ranks = self.shoes[np.arange(self.num_envs), self.position]
+        self.position += mask
+        return drawn_ranks
+
+    # Starts new rounds at all tables and returns (observation, info)
+    def reset(self):
+
+        settled_rounds, settled_reward = self.start_rounds(np.ones(self.num_envs, dtype=bool))
+        return self.observation(), {"settled_rounds": settled_rounds, "settled_reward": settled_reward}
+
+    # Starts new rounds at the tables selected by the mask, dealing again until every round needs a decision
+    # Returns the number and payouts of the rounds settled on the deal at each table
+    def start_rounds(self, mask):
+
+        settled_rounds = np.zeros(self.num_envs, dtype=np.int64)
+        settled_reward = np.zeros(self.num_envs, dtype=np.int64)
+        mask = mask.copy()
+
+        while mask.any():
+
+            self.shuffle(mask & (self.position >= self.cut_card))
+            self.round_start[mask] = self.position[mask]
+
+            # Deal 2 cards to the user and computer, one at a time
+            dealt = [self.deal(mask) for i in range(4)]
+            user = Hands(dealt[0][mask], dealt[2][mask], self.rules)
+            computer = Hands(dealt[1][mask], dealt[3][mask], self.rules)
+
+            for name in ("aces", "sevens", "total", "count", "final_hand_value"):
+                getattr(self.user, name)[mask] = getattr(user, name)
+                getattr(self.computer, name)[mask] = getattr(computer, name)
+
+            self.up_rank[mask] = dealt[1][mask]
+            self.seen_count[mask] = (self.count + rank_count_values[dealt[0]] + rank_count_values[dealt[2]]
+                                     + rank_count_values[dealt[1]])[mask]
+
+            # Settle the Ban Ban and Ban Luck rounds and deal those tables again
+            multiplier = np.zeros(self.num_envs, dtype=np.int64)
+            settled = np.zeros(self.num_envs, dtype=bool)
+
+            def settle(settle_mask, value, code=NONE):
+                settle_mask = settle_mask & mask & ~settled
+                multiplier[settle_mask] = value
+                settled[settle_mask] = True
+
+            settle_special_hands(settle, self.user, self.computer, self.rules.payouts)
+
+            settled_rounds += settled
+            settled_reward += multiplier
+            self.end_rounds(settled)
+            mask = settled
+
+        return settled_rounds, settled_reward
+
+    # Adds every card of the finished rounds selected by the mask to the running count
+    def end_rounds(self, mask):
+
+        window = self.round_start[:, None] + np.arange(cards_per_round)
+        in_round = window < self.position[:, None]
+        window_ranks = self.shoes[np.arange(self.num_envs)[:, None], np.minimum(window, self.shoe_size - 1)]
+
+        self.count += np.where(mask, (rank_count_values[window_ranks] * in_round).sum(axis=1), 0)
+
+    # Plays an action at every table and returns (observation, reward, done, info) as arrays
+    # Tables that are done have already started their next round, and the observation is of the new round
+    def step(self, actions):
+
+        user, computer, payouts = self.user, self.computer, self.rules.payouts
+
+        multiplier = np.zeros(self.num_envs, dtype=np.int64)
+        special = np.zeros(self.num_envs, dtype=np.int8)
+        settled = np.zeros(self.num_envs, dtype=bool)
+
+        # Settles the rounds selected by the mask that are not yet settled
+        def settle(mask, value, code=NONE):
+            mask = mask & ~settled
+            multiplier[mask] = value
+            special[mask] = code
+            settled[mask] = True
+
+        # Stand if the player wants to and the hand is legal
+        stand_value = user.stand_value()
+        hitting = (np.asarray(actions) == HIT) | (stand_value == 0)
+        standing = ~hitting
+        user.final_hand_value[standing] = stand_value[standing]
+
+        drawn_ranks = self.deal(hitting)
+        user.hit(hitting, drawn_ranks)
+        self.seen_count += np.where(hitting, rank_count_values[drawn_ranks], 0)
+
+        # Checking for 777 instant victory condition
+        settle(hitting & (user.sevens == 3) & (user.count == 3), payouts["777"], TRIPLE_SEVEN)
+
+        # Check for Wu Long, busted or not
+        hand_value = user.hand_value()
+        wu_long = hitting & (user.count == 5)
+        settle(wu_long & (hand_value > 21), -payouts["Busted Wu Long"], BUSTED_WU_LONG)
+        settle(wu_long, payouts["Wu Long"], WU_LONG)
+
+        # A busted hand or a hand of 21 ends the player's turn
+        finished = hitting & ~settled & ((hand_value > 21) | (hand_value == 21))
+        user.final_hand_value[finished] = hand_value[finished]
+
+        # Computer's turn at the tables where the player is done
+        dealer_turn_mask = (standing | finished) & ~settled
+        dealer_turn(computer, dealer_turn_mask.copy(), self.shoes, self.position, self.dealer_stand_on)
+
+        def settle_dealer_turn(mask, value, code=NONE):
+            settle(mask & dealer_turn_mask, value, code)
+
+        settle_against_dealer(settle_dealer_turn, user, computer, payouts)
+
+        # Start the next round at the tables that are done
+        done = settled
+        self.end_rounds(done)
+        settled_rounds, settled_reward = self.start_rounds(done)
+
+        return self.observation(), multiplier, done, {"special": special, "settled_rounds": settled_rounds,
+                                                      "settled_reward": settled_reward}
+
+    # Returns the observations as (hand signatures, dealer up cards, card counts) arrays
+    # The hand signatures are an (num_envs, 3) array of (aces, non-ace total, number of cards)
+    def observation(self):
+
+        user = self.user
+        signature = np.stack([user.aces, user.total, user.count], axis=1)
+        return signature, self.up_rank.copy(), self.seen_count.copy()
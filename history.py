@@ -0,0 +1,173 @@
+import mmap
+import struct
+import sys
+
+from blackjack import Card, Ledger, Player
+
+"""
+Binary hand history for Chinese Blackjack (Ban Luck)
+An append-only log of every bet, deal, hit, stand and settlement, written as fixed-width records
+A session can be replayed from the log into the user's and computer dealer's Player stacks
+Every record carries the table id of its session, so the tables of a server can share one log
+"""
+
+# Each record is (table id, event, seat, card int, value, amount in cents)
+# The seat is 0 for the user and 1 for the computer dealer, and the card is no_card when there is none
+# The value is the final hand value for STAND and the payout multiplier for SETTLE
+record_format = struct.Struct("<IBBBbq")
+no_card = 255
+
+SESSION, BET, DEAL, HIT, STAND, SETTLE = range(6)
+event_names = ("SESSION", "BET", "DEAL", "HIT", "STAND", "SETTLE")
+
+USER, DEALER = 0, 1
+
+# A history writer class that appends records to a log file through a write buffer
+# Each session gets the next table id of the writer, and rounds are recorded at the last session's table by default
+
+
+class HistoryWriter():
+
+    def __init__(self, path, buffer_size=1 << 16):
+        self.file = open(path, "ab", buffering=buffer_size)
+        self.tables = 0
+        self.table = 0
+
+    def write(self, event, seat=USER, card=no_card, value=0, amount=0, table=None):
+        self.file.write(record_format.pack(self.table if table is None else table, event, seat, card, value, amount))
+
+    # Starts a session with the user's and computer dealer's starting stacks in cents, and returns its table id
+    def session(self, user_stack, dealer_stack):
+
+        self.table = self.tables
+        self.tables += 1
+
+        self.write(SESSION, USER, amount=user_stack)
+        self.write(SESSION, DEALER, amount=dealer_stack)
+        return self.table
+
+    # Writes every record of a round from its RoundOutcome obj, with the bet in cents
+    def record_round(self, outcome, table=None):
+
+        table = self.table if table is None else table
+
+        def write(event, seat, card=no_card, value=0, amount=0):
+            self.write(event, seat, card, value, amount, table)
+
+        write(BET, USER, amount=outcome.bet)
+
+        # The first 2 cards are dealt one at a time, the rest are hits
+        for i in range(2):
+            write(DEAL, USER, outcome.player_hand[i].to_int())
+            write(DEAL, DEALER, outcome.dealer_hand[i].to_int())
+
+        for card in outcome.player_hand[2:]:
+            write(HIT, USER, card.to_int())
+
+        if outcome.player_value:
+            write(STAND, USER, value=outcome.player_value)
+
+        for card in outcome.dealer_hand[2:]:
+            write(HIT, DEALER, card.to_int())
+
+        if outcome.dealer_value:
+            write(STAND, DEALER, value=outcome.dealer_value)
+
+        write(SETTLE, USER, value=outcome.multiplier, amount=outcome.payout)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# Generator that reads the records of a log file without loading it into memory
+# Yields (table id, event, seat, card int, value, amount in cents) tuples
+
+
+def read_history(path):
+
+    with open(path, "rb") as file:
+
+        # An empty file can not be memory mapped
+        if file.seek(0, 2) == 0:
+            return
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as log:
+
+            # Ignore a partly written record at the end of the log
+            end = len(log) - len(log) % record_format.size
+            view = memoryview(log)[:end]
+
+            records = record_format.iter_unpack(view)
+
+            try:
+                yield from records
+            finally:
+                del records
+                view.release()
+
+# Replays the sessions of a log file into Player objs, the records of each table go to its latest session
+# Returns a list with the (user, computer) Player objs of each session in the order they started,
+# as they were after its last round
+
+
+def replay_history(path):
+
+    sessions = []
+    tables = {}
+
+    for table, event, seat, card, value, amount in read_history(path):
+
+        if event == SESSION:
+
+            if seat == USER:
+                tables[table] = (Player("Player", amount), None, None)
+            else:
+                user = tables[table][0]
+                computer = Player("Computer dealer", amount)
+                tables[table] = (user, computer, Ledger(user, computer))
+                sessions.append((user, computer))
+
+            continue
+
+        user, computer, ledger = tables[table]
+
+        if event == BET:
+            ledger.place_bet(amount)
+            user.clear_hand()
+            computer.clear_hand()
+
+        elif event in (DEAL, HIT):
+            player = user if seat == USER else computer
+            drawn_card = Card.from_int(card)
+            player.hand.append(drawn_card)
+            player.count_card(drawn_card)
+            player.look_up_hand_values()
+
+        elif event == STAND:
+            player = user if seat == USER else computer
+            player.final_hand_value = value
+
+        elif event == SETTLE:
+            ledger.settle(value)
+
+    return sessions
+
+
+if __name__ == "__main__":
+
+    # Prints the number of rounds in a log file and the stacks of each replayed session
+    path = sys.argv[1]
+    rounds = sum(1 for record in read_history(path) if record[1] == SETTLE)
+    print(f"{rounds} rounds in {path}")
+
+    for user, computer in replay_history(path):
+        print(user)
+        print(computer)
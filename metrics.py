@@ -0,0 +1,157 @@
+import time
+
+import blackjack
+
+"""
+Opt-in instrumentation for Chinese Blackjack (Ban Luck) rounds
+Counts and times each round phase, and counts the hand value and stand calls made per round
+When it is not enabled, rounds only pay for a few None checks
+"""
+
+# Round phases, in the order they are played
+# The player phase includes the time the player takes to decide
+phases = ("deal", "special", "player", "dealer", "settlement")
+
+# Player methods that are counted while enabled
+counted_methods = ("update_hand_values", "look_up_hand_values", "stand")
+
+# An instrumentation class that collects the counters of every round played while it is enabled
+
+
+class Instrumentation():
+
+    def __init__(self):
+        self.original_methods = {}
+        self.reset()
+
+    # Sets all the counters back to zero
+    def reset(self):
+        self.rounds = 0
+        self.phase_seconds = dict.fromkeys(phases, 0.0)
+        self.phase_count = dict.fromkeys(phases, 0)
+        self.method_calls = dict.fromkeys(counted_methods, 0)
+
+    # Starts collecting counters for every round played
+    def enable(self):
+
+        if blackjack.instrumentation is not None:
+            blackjack.instrumentation.disable()
+
+        # Wrap the counted Player methods, the originals are put back by disable()
+        for name in counted_methods:
+            self.original_methods[name] = getattr(blackjack.Player, name)
+            setattr(blackjack.Player, name, self.counted(name, self.original_methods[name]))
+
+        blackjack.instrumentation = self
+
+    def disable(self):
+
+        for name, method in self.original_methods.items():
+            setattr(blackjack.Player, name, method)
+
+        self.original_methods = {}
+        blackjack.instrumentation = None
+
+    # Returns a wrapper of a Player method that counts its calls
+    def counted(self, name, method):
+
+        method_calls = self.method_calls
+
+        def wrapper(*args, **kwargs):
+            method_calls[name] += 1
+            return method(*args, **kwargs)
+
+        return wrapper
+
+    # Returns a RoundTimer obj for a round that starts now
+    def start_round(self):
+        return RoundTimer(self)
+
+    # Adds the time one round spent in a phase to the counters
+    def add_phase(self, phase, seconds):
+        self.phase_seconds[phase] += seconds
+        self.phase_count[phase] += 1
+
+    # Returns a dict of all the counters
+    def snapshot(self):
+
+        rounds = max(self.rounds, 1)
+
+        return {
+            "rounds": self.rounds,
+            "phase_seconds": dict(self.phase_seconds),
+            "phase_count": dict(self.phase_count),
+            "method_calls": dict(self.method_calls),
+            "method_calls_per_round": {name: calls / rounds for name, calls in self.method_calls.items()},
+        }
+
+    # Returns the counters in the Prometheus text exposition format
+    def prometheus(self, prefix="blackjack"):
+
+        lines = [
+            f"# HELP {prefix}_rounds_total Rounds played while instrumented.",
+            f"# TYPE {prefix}_rounds_total counter",
+            f"{prefix}_rounds_total {self.rounds}",
+            f"# HELP {prefix}_phase_seconds_total Time spent in each round phase.",
+            f"# TYPE {prefix}_phase_seconds_total counter",
+        ]
+        lines += [f'{prefix}_phase_seconds_total{{phase="{phase}"}} {seconds:.9f}'
+                  for phase, seconds in self.phase_seconds.items()]
+
+        lines += [
+            f"# HELP {prefix}_phase_total Times each round phase was entered.",
+            f"# TYPE {prefix}_phase_total counter",
+        ]
+        lines += [f'{prefix}_phase_total{{phase="{phase}"}} {count}' for phase, count in self.phase_count.items()]
+
+        lines += [
+            f"# HELP {prefix}_method_calls_total Calls of the counted Player methods.",
+            f"# TYPE {prefix}_method_calls_total counter",
+        ]
+        lines += [f'{prefix}_method_calls_total{{method="{name}"}} {calls}'
+                  for name, calls in self.method_calls.items()]
+
+        return "\n".join(lines) + "\n"
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+# A round timer class that keeps the current phase of one round and adds each phase's time to the instrumentation
+# Every round has its own, so the rounds of a server's tables can be played side by side
+
+
+class RoundTimer():
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.phase = "deal"
+        self.phase_start = time.perf_counter()
+
+    # Ends the current phase and starts the next one
+    def mark(self, next_phase):
+
+        now = time.perf_counter()
+        self.metrics.add_phase(self.phase, now - self.phase_start)
+        self.phase = next_phase
+        self.phase_start = now
+
+    def end_round(self):
+        self.mark(None)
+        self.metrics.rounds += 1
+
+
+if __name__ == "__main__":
+
+    # Plays some instrumented rounds and prints the counters
+    with Instrumentation() as metrics:
+
+        shoe = blackjack.Shoe()
+        for i in range(10000):
+            shoe.start_round()
+            blackjack.play_round(shoe)
+
+    print(metrics.prometheus(), end="")
@@ -0,0 +1,182 @@
+from functools import lru_cache
+
+from blackjack import compute_hand_values, default_rules, ranks
+
+"""
+Exact dealer outcome probabilities for Chinese Blackjack (Ban Luck)
+The dealer draws until his hand is legal to stand on, stopping at 5 cards or when busted, same as main()
+The hand values and the minimum to stand on come from a RuleSet obj, the standard rules by default
+"""
+
+# The remaining deck is described by a composition, a tuple with the number of cards of each value class
+# Ten, Jack, Queen and King all share the Ten class, Seven has its own class for 777
+value_classes = ("Ace", "Two", "Three", "Four", "Five", "Six", "Seven", "Eight", "Nine", "Ten")
+class_values = (0, 2, 3, 4, 5, 6, 7, 8, 9, 10)
+ace_class = value_classes.index("Ace")
+seven_class = value_classes.index("Seven")
+
+# Final dealer hands that are not a legal hand value to stand on
+special_outcomes = ("Bust", "Wu Long", "Busted Wu Long", "777", "Ban Ban", "Ban Luck")
+
+# Returns the possible final dealer hands, in the order of the probabilities returned by the recursion
+# The legal hand values go from the minimum hand value to stand on up to 21
+
+
+@lru_cache(maxsize=None)
+def rule_outcomes(stand_minimum=16):
+
+    return tuple(range(stand_minimum, 22)) + special_outcomes
+
+
+# Possible final dealer hands under the standard rules
+outcomes = rule_outcomes(default_rules.stand_minimum)
+
+# Function takes in a rank name and returns its value class index
+
+
+def value_class(rank):
+
+    return min(ranks.index(rank), len(value_classes) - 1)
+
+# Function takes in a list of card objs and returns their composition
+
+
+def composition_of(list_of_cards):
+
+    composition = [0] * len(value_classes)
+
+    for card in list_of_cards:
+        composition[value_class(card.rank)] += 1
+
+    return tuple(composition)
+
+# Returns the composition of a full shoe with the given number of decks
+
+
+def full_composition(num_decks=1):
+
+    return tuple(4 * num_decks * (4 if name == "Ten" else 1) for name in value_classes)
+
+# Function takes in a composition and returns it without the given cards
+
+
+def remove_cards(composition, list_of_cards):
+
+    return tuple(count - removed for count, removed in zip(composition, composition_of(list_of_cards)))
+
+# Returns a tuple of probabilities with all of the probability on one outcome
+
+
+@lru_cache(maxsize=None)
+def _certain(outcome, stand_minimum=16):
+
+    outcomes = rule_outcomes(stand_minimum)
+    probabilities = [0.0] * len(outcomes)
+    probabilities[outcomes.index(outcome)] = 1.0
+    return tuple(probabilities)
+
+# Returns the probability of each outcome for a dealer hand in the middle of the dealer loop
+# The hand is given by its number of aces, total of the non-ace cards, number of cards and whether
+# all of its cards are sevens, and the ace values and the minimum to stand on of the rules
+# Results are memoized on the composition, hand and rules, across queries
+
+
+@lru_cache(maxsize=None)
+def dealer_hand_outcomes(composition, aces, non_ace_total, num_cards, all_sevens, ace_values=(1, 11, 10),
+                         stand_minimum=16):
+
+    hand_value, hand_value_with_ace, legal_hand_value = compute_hand_values(
+        aces, non_ace_total, num_cards, ace_values, stand_minimum)
+
+    # If hand busts or computer has a Wu Long hand, the dealer stops drawing
+    if num_cards == 5:
+        return _certain("Wu Long" if hand_value <= 21 else "Busted Wu Long", stand_minimum)
+
+    if hand_value > 21:
+        return _certain("Bust", stand_minimum)
+
+    # The dealer stands on a legal hand
+    if legal_hand_value:
+
+        if num_cards == 3 and all_sevens:
+            return _certain("777", stand_minimum)
+
+        return _certain(legal_hand_value, stand_minimum)
+
+    # Else the dealer draws a card, weighted by how many of each class are left
+    remaining = sum(composition)
+    probabilities = [0.0] * len(rule_outcomes(stand_minimum))
+
+    for i, count in enumerate(composition):
+
+        if count == 0:
+            continue
+
+        next_composition = composition[:i] + (count - 1,) + composition[i + 1:]
+
+        if i == ace_class:
+            next_outcomes = dealer_hand_outcomes(
+                next_composition, aces + 1, non_ace_total, num_cards + 1, False, ace_values, stand_minimum)
+        else:
+            next_outcomes = dealer_hand_outcomes(
+                next_composition, aces, non_ace_total + class_values[i], num_cards + 1,
+                all_sevens and i == seven_class, ace_values, stand_minimum)
+
+        weight = count / remaining
+        for j, probability in enumerate(next_outcomes):
+            probabilities[j] += weight * probability
+
+    return tuple(probabilities)
+
+# Returns a dict of {outcome: probability} for the dealer's final hand
+# Takes in the composition of the cards the dealer can still draw, not including the up card,
+# and the dealer's face up card obj. The hole card is drawn from the composition too.
+# Ban Ban and Ban Luck are the dealer's 2 card special hands that end the round before the dealer loop
+# The dealer plays with the house rules of a RuleSet obj, the standard rules by default
+
+
+def dealer_distribution(composition, up_card, rules=None):
+
+    rules = rules or default_rules
+    ace_values = tuple(rules.ace_values)
+    stand_minimum = rules.stand_minimum
+    outcomes = rule_outcomes(stand_minimum)
+
+    up_class = value_class(up_card.rank)
+    up_aces = int(up_class == ace_class)
+    up_total = class_values[up_class]
+
+    remaining = sum(composition)
+    probabilities = [0.0] * len(outcomes)
+
+    # Draw the hole card
+    for i, count in enumerate(composition):
+
+        if count == 0:
+            continue
+
+        aces = up_aces + (i == ace_class)
+        non_ace_total = up_total + class_values[i]
+        next_composition = composition[:i] + (count - 1,) + composition[i + 1:]
+
+        # Check for Ban Ban and Ban Luck
+        if aces == 2:
+            next_outcomes = _certain("Ban Ban", stand_minimum)
+        elif rules.compute_hand_values(aces, non_ace_total, 2)[1] == 21:
+            next_outcomes = _certain("Ban Luck", stand_minimum)
+        else:
+            next_outcomes = dealer_hand_outcomes(
+                next_composition, aces, non_ace_total, 2, up_class == i == seven_class, ace_values, stand_minimum)
+
+        weight = count / remaining
+        for j, probability in enumerate(next_outcomes):
+            probabilities[j] += weight * probability
+
+    return dict(zip(outcomes, probabilities))
+
+# Clears the memoized dealer outcomes, e.g. to free memory after a long run
+
+
+def clear_cache():
+
+    dealer_hand_outcomes.cache_clear()
@@ -0,0 +1,75 @@
+from array import array
+
+import numpy as np
+
+from blackjack import RandomEngine
+
+"""
+NumPy random engines for shuffling Chinese Blackjack (Ban Luck) decks
+A whole batch of permutations is made in one call, as the argsort of a batch of random keys
+Use them in place of the default engine, e.g. Shoe(engine=NumpyEngine(seed)) or Deck(engine=CounterEngine(seed))
+"""
+
+# A random engine class built on a NumPy Generator, PCG64 by default
+# The seed is an int or a SeedSequence, or a Generator can be given to use as it is
+
+
+class NumpyEngine(RandomEngine):
+
+    def __init__(self, seed=None, batch_size=4096, bit_generator=np.random.PCG64, generator=None):
+        self.generator = generator or np.random.Generator(bit_generator(seed))
+        self.batch_size = batch_size
+        self.batches = {}
+
+    # Returns an (n, size) array of permutations of range(size)
+    def permutations(self, n, size=52):
+
+        keys = self.generator.random((n, size))
+        return np.argsort(keys, axis=1).astype(np.int16)
+
+    # Returns the next permutation from the current batch as a list, making a new batch once it runs out
+    # Only single decks are batched, a shoe is shuffled far less often and its permutations are much bigger
+    def permutation(self, size=52):
+
+        batch = self.batches.get(size)
+
+        if not batch:
+            batch = self.batches[size] = self.permutations(self.batch_size if size == 52 else 1, size).tolist()
+
+        return batch.pop()
+
+    # Shuffles a list or array of cards in place with the next permutation
+    def shuffle(self, cards):
+
+        permutation = self.permutation(len(cards))
+        shuffled = [cards[i] for i in permutation]
+
+        cards[:] = shuffled if isinstance(cards, list) else array(cards.typecode, shuffled)
+
+    # Returns n engines with independent streams spawned from this engine's seed
+    def spawn(self, n):
+        return [NumpyEngine(batch_size=self.batch_size, generator=generator) for generator in self.generator.spawn(n)]
+
+# A counter-based random engine, built on NumPy's Philox generator
+# The stream is a function of the key and a counter, so stream i starts 2**128 draws after stream i - 1
+# and any number of workers can take streams of the same key without overlapping
+# The seed is an int or a SeedSequence, and the key comes from it
+
+
+class CounterEngine(NumpyEngine):
+
+    def __init__(self, seed=None, batch_size=4096, stream=0, generator=None):
+
+        if generator is None:
+            self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+            generator = np.random.Generator(np.random.Philox(self.seed_sequence).jumped(stream))
+        else:
+            self.seed_sequence = generator.bit_generator.seed_seq
+
+        super().__init__(batch_size=batch_size, generator=generator)
+
+    # Returns n engines with keys of their own, spawned from this engine's SeedSequence
+    # The SeedSequence counts the engines it has spawned, so every call gives new keys, and they never
+    # share a key with the streams of this engine
+    def spawn(self, n):
+        return [CounterEngine(seed_sequence, self.batch_size) for seed_sequence in self.seed_sequence.spawn(n)]
@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from blackjack import RuleSet, default_rules
+from simulation import SimulationStats, deal_rounds, settle_rounds
+
+"""
+Columnar result store for Chinese Blackjack (Ban Luck) simulations
+Each outcome column is a file of fixed-width values in its own dtype, and rounds are appended to every column
+one chunk at a time. A chunk only counts once the index file records it, so a run that crashed mid chunk
+picks up from the last recorded chunk, and one column can be loaded as a memmap without reading the others
+"""
+
+# The columns of every store and their dtypes
+# The cards are card ints, and a final hand value is 0 for a hand that was settled before it was played out
+# The stack delta is the player's winnings in cents
+columns = {
+    "user_first": np.uint8,
+    "user_second": np.uint8,
+    "computer_first": np.uint8,
+    "computer_second": np.uint8,
+    "user_value": np.int8,
+    "computer_value": np.int8,
+    "special": np.int8,
+    "multiplier": np.int8,
+    "stack_delta": np.int64,
+}
+
+index_name = "index.json"
+
+# A result store class for a directory of column files and their index
+# A store opened for reading only sees the chunks its index recorded when it was opened, and never changes a file
+# Opening it writable makes the store when the directory has no index yet, with the metadata dict kept in its index,
+# and cuts off anything a crashed writer left after the last recorded chunk
+
+
+class ResultStore():
+
+    def __init__(self, path, metadata=None, writable=False):
+        self.path = path
+        self.index_path = os.path.join(path, index_name)
+        self.writable = writable
+
+        if writable and not os.path.exists(self.index_path):
+            os.makedirs(path, exist_ok=True)
+            self.chunks = []
+            self.metadata = metadata or {}
+            self.commit()
+
+        with open(self.index_path) as file:
+            index = json.load(file)
+
+        self.chunks = index["chunks"]
+        self.metadata = index["metadata"]
+
+        if writable:
+            for name, dtype in columns.items():
+                with open(self.column_path(name), "ab") as file:
+                    size = len(self) * np.dtype(dtype).itemsize
+
+                    if file.tell() < size:
+                        raise ValueError(f"{self.column_path(name)} is shorter than its index.")
+
+                    file.truncate(size)
+
+    # Number of rounds in the recorded chunks
+    def __len__(self):
+        return sum(self.chunks)
+
+    def column_path(self, name):
+        return os.path.join(self.path, name + ".col")
+
+    # Writes the index to a temporary file and moves it over the old one, so the index is never half written
+    def commit(self):
+
+        index = {"columns": {name: np.dtype(dtype).str for name, dtype in columns.items()},
+                 "rows": len(self), "chunks": self.chunks, "metadata": self.metadata}
+        temporary_path = self.index_path + ".tmp"
+
+        with open(temporary_path, "w") as file:
+            json.dump(index, file)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temporary_path, self.index_path)
+
+    # Appends a chunk of rounds from a dict of {column name: array}, every column has to be given
+    # The column files are synced to disk before the index records the chunk
+    def append(self, chunk):
+
+        if not self.writable:
+            raise ValueError(f"{self.path} is open for reading only.")
+
+        if set(chunk) != set(columns):
+            raise ValueError(f"A chunk needs the columns {', '.join(columns)}.")
+
+        rows = {len(values) for values in chunk.values()}
+        if len(rows) != 1:
+            raise ValueError("Every column of a chunk needs the same number of rounds.")
+
+        for name, dtype in columns.items():
+            with open(self.column_path(name), "ab") as file:
+                file.write(np.ascontiguousarray(chunk[name], dtype=dtype).tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+
+        self.chunks.append(rows.pop())
+        self.commit()
+
+    # Returns a column of the recorded chunks as a read-only memmap
+    # Rounds a writer appended after the store was opened are left out
+    def column(self, name):
+
+        if not len(self):
+            return np.zeros(0, dtype=columns[name])
+
+        path = self.column_path(name)
+        if os.path.getsize(path) < len(self) * np.dtype(columns[name]).itemsize:
+            raise ValueError(f"{path} is shorter than its index.")
+
+        return np.memmap(path, dtype=columns[name], mode="r", shape=(len(self),))
+
+    # Returns a SimulationStats obj of the recorded rounds, read from the special and multiplier columns
+    def stats(self, max_multiplier=7):
+
+        stats = SimulationStats(max_multiplier)
+        stats.add(self.column("multiplier"), self.column("special"))
+        return stats
+
+# Settles a chunk of dealt rounds and returns its dict of {column name: array}, with the bet in cents
+
+
+def round_columns(cards, bet=100, stand_on=None, dealer_stand_on=None, rules=None):
+
+    multiplier, special, user, computer = settle_rounds(cards, stand_on, dealer_stand_on, rules, hands=True)
+
+    return {
+        "user_first": cards[:, 0],
+        "user_second": cards[:, 2],
+        "computer_first": cards[:, 1],
+        "computer_second": cards[:, 3],
+        "user_value": user.final_hand_value,
+        "computer_value": computer.final_hand_value,
+        "special": special,
+        "multiplier": multiplier,
+        "stack_delta": multiplier.astype(np.int64) * bet,
+    }
+
+# Simulates n rounds into the store at path, in chunks of chunk_size rounds, and returns the ResultStore obj
+# Round r is round r % chunk_size of the seed's stream r // chunk_size, so a store that already has some rounds
+# carries on from the next one, and a run that crashed or was extended ends up with the same rounds as one
+# that never stopped. A short last chunk is topped up from its own stream before the next stream is started
+# The seed and settings are kept in the store's metadata, and resuming with other ones raises a ValueError
+
+
+def record_rounds(path, n, seed=None, chunk_size=1_000_000, bet=100, stand_on=None, dealer_stand_on=None,
+                  rules=None):
+
+    rules = rules or default_rules
+
+    # A new store keeps the entropy of its seed, so it can be resumed without one
+    if seed is None and not os.path.exists(os.path.join(path, index_name)):
+        seed = np.random.SeedSequence().entropy
+
+    metadata = json.loads(json.dumps({"seed": seed, "chunk_size": chunk_size, "bet": bet, "stand_on": stand_on,
+                                      "dealer_stand_on": dealer_stand_on, "rules": rules.to_dict()}))
+    store = ResultStore(path, metadata, writable=True)
+
+    if seed is None:
+        metadata["seed"] = seed = store.metadata["seed"]
+
+    if store.metadata != metadata:
+        raise ValueError(f"{path} was recorded with other settings, {store.metadata}.")
+
+    while len(store) < n:
+
+        # The rows of a stream come out in order, so dealing its first rounds again gives the same cards
+        stream, start = divmod(len(store), chunk_size)
+        rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(stream,)))
+        cards = deal_rounds(min(chunk_size, start + n - len(store)), rng)[start:]
+        store.append(round_columns(cards, bet, stand_on, dealer_stand_on, rules))
+
+    return store
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Simulate Chinese Blackjack rounds into a columnar result store.")
+    parser.add_argument("path")
+    parser.add_argument("rounds", nargs="?", type=int, default=10_000_000)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--bet", type=int, default=100, help="bet of each round in cents")
+    parser.add_argument("--rules", type=RuleSet.load, default=default_rules, metavar="PATH",
+                        help="JSON file of house rules")
+    args = parser.parse_args()
+
+    store = record_rounds(args.path, args.rounds, args.seed, args.chunk_size, args.bet, rules=args.rules)
+    print(f"{store.path}: {store.stats(max(args.rules.payouts.values()))}")
@@ -0,0 +1,241 @@
+import argparse
+import asyncio
+from decimal import InvalidOperation
+
+from blackjack import Ledger, Player, RuleSet, Shoe, default_rules, format_dollars, ranks, round_steps, to_cents
+from history import HistoryWriter
+
+"""
+Chinese Blackjack (Ban Luck) game server
+Hosts one table per connection on a single asyncio event loop and speaks a line based TCP protocol
+
+Client commands, one per line:
+    BET <amount>    starts a round with a bet
+    HIT             draws a card
+    STAND           stands on a legal hand
+    QUIT            leaves the table
+
+Server replies, one per line:
+    WELCOME <stack>
+    DEAL <dealer up card> <card> <card>
+    CARD <card>
+    TURN <hand value> <hand value with ace> <legal hand value>     the player has to hit or stand
+    RESULT <multiplier> <special hand or -> <payout> <stack> <house stack> <dealer cards...>
+    GAMEOVER        the player or the house has lost all of its stack, sent after RESULT
+    ERR <message>
+    BYE
+
+Every reply ends with a WELCOME, TURN, RESULT, GAMEOVER, ERR or BYE line
+
+A card is its rank letter and suit letter, e.g. AS for the Ace of Spades and TH for the Ten of Hearts
+"""
+
+rank_letters = "A23456789TJQK"
+
+# Function takes in a card obj and returns its 2 letter code
+
+
+def card_code(card):
+
+    return rank_letters[ranks.index(card.rank)] + card.suit[0]
+
+# A table class that holds one player's stack and the round in progress
+# The rounds are played with the house rules of a RuleSet obj
+
+
+class Table():
+
+    def __init__(self, stack, history=None, rules=default_rules):
+        self.shoe = Shoe(num_decks=1, penetration=0)
+        self.round = None
+        self.rules = rules
+
+        # Stacks and bets are in cents
+        self.user = Player("Player", stack)
+        self.house = Player("Computer dealer", stack)
+        self.ledger = Ledger(self.user, self.house)
+
+        # Hand history writer for this table's session and its table id in the log, see history.py
+        self.history = history
+        if history is not None:
+            self.table_id = history.session(stack, stack)
+
+    # Starts a round and returns the reply lines
+    def start_round(self, amount):
+
+        if self.round is not None:
+            return ["ERR a round is already in progress"]
+
+        try:
+            bet = to_cents(amount)
+        except InvalidOperation:
+            return ["ERR please enter a valid number"]
+
+        if bet <= 0:
+            return ["ERR you can't bet negative or zero dollars"]
+
+        if bet > self.user.stack:
+            return [f"ERR you don't have enough chips, you have {format_dollars(self.user.stack)} left"]
+
+        self.ledger.place_bet(bet)
+
+        self.shoe.start_round()
+        self.round = round_steps(self.shoe, bet=bet, rules=self.rules)
+
+        return self.advance(None)
+
+    # Sends the player's decision to the round, None to start it, and returns the reply lines
+    def advance(self, hit):
+
+        try:
+            if hit is None:
+                user, computer = next(self.round)
+            else:
+                user, computer = self.round.send(hit)
+
+            player_hand, dealer_hand = user.hand, computer.hand
+            lines = [turn_line(user)]
+
+        except StopIteration as round_over:
+            outcome = round_over.value
+            player_hand, dealer_hand = outcome.player_hand, outcome.dealer_hand
+            lines = self.settle(outcome)
+
+        if hit is None:
+            lines.insert(0, f"DEAL {card_code(dealer_hand[0])} {card_code(player_hand[0])} {card_code(player_hand[1])}")
+        elif hit:
+            lines.insert(0, f"CARD {card_code(player_hand[-1])}")
+
+        return lines
+
+    def hit(self):
+
+        if self.round is None:
+            return ["ERR place a bet first"]
+
+        return self.advance(True)
+
+    def stand(self):
+
+        if self.round is None:
+            return ["ERR place a bet first"]
+
+        lines = self.advance(False)
+
+        # Standing on a hand that is not legal leaves it the player's turn
+        if lines[0].startswith("TURN"):
+            return [f"ERR the minimum point to stand is {self.rules.stand_minimum}, please hit"]
+
+        return lines
+
+    # Pays out a finished round and returns the reply lines
+    def settle(self, outcome):
+
+        self.round = None
+        self.ledger.settle(outcome.multiplier)
+
+        if self.history is not None:
+            self.history.record_round(outcome, self.table_id)
+
+        special = outcome.special.replace(" ", "_") if outcome.special else "-"
+        dealer_cards = " ".join(card_code(card) for card in outcome.dealer_hand)
+        lines = [f"RESULT {outcome.multiplier} {special} {format_dollars(outcome.payout)} "
+                 f"{format_dollars(self.user.stack)} {format_dollars(self.house.stack)} {dealer_cards}"]
+
+        # The game ends once either side has lost its stack, same as in main()
+        if self.user.stack <= 0 or self.house.stack <= 0:
+            lines.append("GAMEOVER")
+
+        return lines
+
+# Returns the TURN line for a player whose turn it is
+
+
+def turn_line(user):
+
+    return f"TURN {user.hand_value} {user.hand_value_with_ace} {user.legal_hand_value}"
+
+# A game server class that starts a table for every client connection
+# If a HistoryWriter obj is given, every table records its session in it, each under its own table id
+
+
+class GameServer():
+
+    def __init__(self, stack=100000, rules=default_rules, history=None):
+        self.stack = stack
+        self.rules = rules
+        self.history = history
+        self.tables = 0
+
+    # Plays with one client until it quits or disconnects
+    async def handle_client(self, reader, writer):
+
+        table = Table(self.stack, self.history, self.rules)
+        self.tables += 1
+        writer.write(f"WELCOME {format_dollars(table.user.stack)}\n".encode())
+
+        try:
+            while True:
+
+                line = await reader.readline()
+                if not line:
+                    break
+
+                command, _, argument = line.decode().strip().partition(" ")
+                command = command.upper()
+
+                if command == "BET":
+                    lines = table.start_round(argument)
+                elif command == "HIT":
+                    lines = table.hit()
+                elif command == "STAND":
+                    lines = table.stand()
+                elif command == "QUIT":
+                    writer.write(b"BYE\n")
+                    break
+                else:
+                    lines = ["ERR unknown command, use BET, HIT, STAND or QUIT"]
+
+                writer.write(("\n".join(lines) + "\n").encode())
+                await writer.drain()
+
+                if lines[-1] == "GAMEOVER":
+                    break
+
+        except ConnectionError:
+            pass
+
+        finally:
+            self.tables -= 1
+            writer.close()
+
+            # Write out the table's hand history once its player has left
+            if self.history is not None:
+                self.history.flush()
+
+    async def serve(self, host, port):
+
+        server = await asyncio.start_server(self.handle_client, host, port)
+
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Host Chinese Blackjack tables over TCP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stack", type=to_cents, default=100000, help="starting stack of every table, in dollars")
+    parser.add_argument("--rules", type=RuleSet.load, default=default_rules, metavar="PATH",
+                        help="JSON file of house rules")
+    parser.add_argument("--history", metavar="PATH", help="append every table's hand history to a log file")
+    args = parser.parse_args()
+
+    print(f"Serving Chinese Blackjack tables on {args.host}:{args.port}")
+
+    if args.history:
+        with HistoryWriter(args.history) as history:
+            asyncio.run(GameServer(args.stack, args.rules, history).serve(args.host, args.port))
+    else:
+        asyncio.run(GameServer(args.stack, args.rules).serve(args.host, args.port))
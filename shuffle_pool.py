@@ -0,0 +1,136 @@
+import argparse
+import mmap
+import os
+
+import numpy as np
+
+from blackjack import card_objs
+from random_engines import CounterEngine
+from simulation import SimulationStats, cards_per_round, settle_rounds
+
+"""
+Pre-generated shuffle pool for Chinese Blackjack (Ban Luck)
+A binary file of deck permutations, one 52 byte record of card ints per deck, read through a read-only mmap
+Decks are dealt straight out of the mapped file without copying, and every process that maps the same pool
+gets the same deals, so policy comparisons play identical decks without paying for any shuffles
+"""
+
+# Number of bytes in each permutation record
+deck_size = len(card_objs)
+
+# Writes a pool of n deck permutations to a file, made in chunks of chunk_size permutations
+# The permutations come from the engine, a counter-based engine seeded with seed by default
+
+
+def write_pool(path, n, seed=None, engine=None, chunk_size=65536):
+
+    engine = engine or CounterEngine(seed)
+
+    with open(path, "wb") as file:
+
+        written = 0
+        while written < n:
+
+            chunk = min(chunk_size, n - written)
+            file.write(engine.permutations(chunk, deck_size).astype(np.uint8).tobytes())
+            written += chunk
+
+# A deck class that deals the cards of one pool permutation from the front, without copying them
+# It can be used in place of a Deck obj, and deals the same cards as simulation.py does for the same permutation
+
+
+class PoolDeck():
+
+    def __init__(self, cards):
+        self.cards = cards
+        self.position = 0
+
+    def deal(self):
+        card = card_objs[self.cards[self.position]]
+        self.position += 1
+        return card
+
+    # Deals the next card int without creating a card obj
+    def deal_int(self):
+        card_int = self.cards[self.position]
+        self.position += 1
+        return card_int
+
+# A shuffle pool class that maps a pool file read-only, several processes can map the same file at once
+# An empty file can not be mapped, and is an empty pool
+
+
+class ShufflePool():
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+
+        if os.fstat(self.file.fileno()).st_size:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.map = bytes()
+
+        self.view = memoryview(self.map)
+
+    # Number of permutations in the pool, a partly written record at the end is ignored
+    def __len__(self):
+        return len(self.view) // deck_size
+
+    # Returns a PoolDeck obj for the permutation at index
+    def deck(self, index):
+        return PoolDeck(self.view[index * deck_size:(index + 1) * deck_size])
+
+    # Returns the permutations from start to stop as an (n, 52) uint8 array that reads the mapped file directly
+    def rows(self, start=0, stop=None):
+
+        stop = len(self) if stop is None else min(stop, len(self))
+        return np.frombuffer(self.map, dtype=np.uint8, count=(stop - start) * deck_size,
+                             offset=start * deck_size).reshape(-1, deck_size)
+
+    # Decks and arrays from the pool that are still in use keep the map open until they are freed
+    def close(self):
+        self.view.release()
+        self.file.close()
+
+        if isinstance(self.map, mmap.mmap):
+            try:
+                self.map.close()
+            except BufferError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# Settles the pool's permutations from start to stop under each RuleSet obj in rule_sets, in chunks of chunk_size
+# Returns a list of SimulationStats objs in the same order, see simulation.simulate_rule_sets()
+# Workers sharing one pool can each take their own start and stop, or all settle the same deals
+
+
+def simulate_pool(pool, rule_sets, start=0, stop=None, stand_on=None, dealer_stand_on=None, chunk_size=200_000):
+
+    stop = len(pool) if stop is None else min(stop, len(pool))
+    all_stats = [SimulationStats(max(rules.payouts.values())) for rules in rule_sets]
+
+    for chunk_start in range(start, stop, chunk_size):
+
+        cards = pool.rows(chunk_start, min(chunk_start + chunk_size, stop))[:, :cards_per_round]
+
+        for rules, stats in zip(rule_sets, all_stats):
+            stats.add(*settle_rounds(cards, stand_on, dealer_stand_on, rules))
+
+    return all_stats
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Write a pool of shuffled Chinese Blackjack decks.")
+    parser.add_argument("path")
+    parser.add_argument("decks", nargs="?", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    write_pool(args.path, args.decks, args.seed)
+    print(f"Wrote {args.decks} decks ({args.decks * deck_size / 1e6:.1f} MB) to {args.path}")
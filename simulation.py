@@ -0,0 +1,360 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from blackjack import default_rules, load_rule_sets, ranks
+
+"""
+Vectorized Monte Carlo simulator for Chinese Blackjack (Ban Luck) rounds
+Deals, evaluates and settles many rounds at once as NumPy arrays, with the same rules as play_round()
+Many house rule variants can be settled on the same dealt rounds, to compare them without noise between them
+"""
+
+# A card is an index from 0 to 51 into a Deck, in the same order Deck() builds its cards
+# The rank of a card is its index modulo 13, with the Ace as rank 0 and the Seven as rank 6
+ace_rank = ranks.index("Ace")
+seven_rank = ranks.index("Seven")
+
+# Non-ace value of each rank, the ace counts as 0 here as it is tracked separately
+rank_values = np.array([0, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10], dtype=np.int8)
+
+# A round never uses more than 10 cards, 5 for the player and 5 for the dealer
+cards_per_round = 10
+
+# Special hand codes used in the special array returned by settle_rounds()
+NONE, BAN_BAN, BAN_LUCK, TRIPLE_SEVEN, WU_LONG, BUSTED_WU_LONG = range(6)
+special_names = (None, "Ban Ban", "Ban Luck", "777", "Wu Long", "Busted Wu Long")
+
+# Deals n rounds from n shuffled decks as an (n, 10) array of card indexes
+# The cards are dealt from the front of each row, a shuffle is the argsort of random float64 keys
+# float32 keys only have 2**24 values, and tied keys always keep their order, which would bias the shuffle
+
+
+def deal_rounds(n, rng):
+
+    keys = rng.random((n, 52))
+    return np.argsort(keys, axis=1)[:, :cards_per_round].astype(np.int8)
+
+# A vectorized version of a player's hand, holding the running totals needed for the hand values
+# The ace values and the minimum hand value to stand on come from a RuleSet obj
+
+
+class Hands():
+
+    def __init__(self, first_ranks, second_ranks, rules=default_rules):
+        self.ace_values = rules.ace_values
+        self.stand_minimum = rules.stand_minimum
+        self.aces = (first_ranks == ace_rank).astype(np.int8) + (second_ranks == ace_rank)
+        self.sevens = (first_ranks == seven_rank).astype(np.int8) + (second_ranks == seven_rank)
+        self.total = rank_values[first_ranks] + rank_values[second_ranks]
+        self.count = np.full(len(first_ranks), 2, dtype=np.int8)
+        self.final_hand_value = np.zeros(len(first_ranks), dtype=np.int8)
+
+    # Adds a card to the hands selected by the mask
+    def hit(self, mask, drawn_ranks):
+        self.aces += mask & (drawn_ranks == ace_rank)
+        self.sevens += mask & (drawn_ranks == seven_rank)
+        self.total += np.where(mask, rank_values[drawn_ranks], 0).astype(np.int8)
+        self.count += mask
+
+    # Same as Player.hand_value, aces count as 1
+    def hand_value(self):
+        return self.total + self.ace_values[0] * self.aces
+
+    # Same as Player.hand_value_with_ace, aces count as 11 with 2 cards, 10 with 3 cards, else 0
+    def hand_value_with_ace(self):
+        with_ace = np.where(self.count == 2, self.total + self.ace_values[1] * self.aces,
+                            self.total + self.ace_values[2] * self.aces)
+        return np.where((self.aces > 0) & (self.count <= 3), with_ace, 0)
+
+    # Same as Player.stand, the highest legal hand value, or 0 if there is no legal hand
+    def stand_value(self):
+        hand_value = self.hand_value()
+        with_ace = self.hand_value_with_ace()
+        hand_value = np.where((self.stand_minimum <= hand_value) & (hand_value <= 21), hand_value, 0)
+        with_ace = np.where((self.stand_minimum <= with_ace) & (with_ace <= 21), with_ace, 0)
+        return np.maximum(hand_value, with_ace)
+
+# Settles rounds dealt as an (n, 10) array of card indexes, dealt from the front of each row
+# The player hits until his legal hand value reaches stand_on, the dealer until it reaches dealer_stand_on
+# The rounds are played with the house rules of a RuleSet obj, the standard rules by default
+# Both stand on the rule set's minimum hand value to stand on when stand_on or dealer_stand_on is not given
+# Returns the player's payout multipliers and the special hand codes of each round,
+# followed by the user's and computer's Hands objs when hands is True
+
+
+def settle_rounds(cards, stand_on=None, dealer_stand_on=None, rules=None, hands=False):
+
+    rules = rules or default_rules
+    payouts = rules.payouts
+    stand_on = stand_on or rules.stand_minimum
+    dealer_stand_on = dealer_stand_on or rules.stand_minimum
+
+    n = len(cards)
+    card_ranks = cards % 13
+    rows = np.arange(n)
+
+    multiplier = np.zeros(n, dtype=np.int8)
+    special = np.zeros(n, dtype=np.int8)
+    settled = np.zeros(n, dtype=bool)
+
+    # Deal 2 cards to the user and computer, one at a time
+    user = Hands(card_ranks[:, 0], card_ranks[:, 2], rules)
+    computer = Hands(card_ranks[:, 1], card_ranks[:, 3], rules)
+    next_card = np.full(n, 4, dtype=np.int8)
+
+    # Settles the rounds selected by the mask that are not yet settled
+    def settle(mask, value, code=NONE):
+        mask = mask & ~settled
+        multiplier[mask] = value
+        special[mask] = code
+        settled[mask] = True
+
+    settle_special_hands(settle, user, computer, payouts)
+
+    # Player's turn, at most 3 hits before reaching a Wu Long
+    playing = ~settled
+    for i in range(3):
+
+        hand_value = user.hand_value()
+        stand_value = user.stand_value()
+
+        # A hand of 21 stands, else stand once the legal hand value is high enough
+        standing = playing & ((hand_value == 21) | (stand_value >= stand_on))
+        user.final_hand_value[standing] = np.where(hand_value == 21, 21, stand_value)[standing]
+        playing &= ~standing
+
+        user.hit(playing, card_ranks[rows, next_card])
+        next_card += playing
+
+        # Checking for 777 instant victory condition
+        settle(playing & (user.sevens == 3) & (user.count == 3), payouts["777"], TRIPLE_SEVEN)
+
+        # Check for Wu Long, busted or not
+        hand_value = user.hand_value()
+        wu_long = playing & (user.count == 5)
+        settle(wu_long & (hand_value > 21), -payouts["Busted Wu Long"], BUSTED_WU_LONG)
+        settle(wu_long, payouts["Wu Long"], WU_LONG)
+
+        # Else if user hand is busted
+        busted = playing & (hand_value > 21)
+        user.final_hand_value[busted] = hand_value[busted]
+        playing &= ~settled & ~busted
+
+    dealer_turn(computer, ~settled, card_ranks, next_card, dealer_stand_on)
+    settle_against_dealer(settle, user, computer, payouts)
+
+    if hands:
+        return multiplier, special, user, computer
+
+    return multiplier, special
+
+# Settles the rounds with a Ban Ban or Ban Luck on the deal through settle(mask, multiplier, special code)
+
+
+def settle_special_hands(settle, user, computer, payouts):
+
+    # Check for Ban Ban
+    user_aces = user.aces == 2
+    computer_aces = computer.aces == 2
+    settle(user_aces & computer_aces, 0, BAN_BAN)
+    settle(user_aces, payouts["Ban Ban"], BAN_BAN)
+    settle(computer_aces, -payouts["Ban Ban"], BAN_BAN)
+
+    # Check for Ban Luck
+    user_ban_luck = user.hand_value_with_ace() == 21
+    computer_ban_luck = computer.hand_value_with_ace() == 21
+    settle(user_ban_luck & computer_ban_luck, 0, BAN_LUCK)
+    settle(user_ban_luck, payouts["Ban Luck"], BAN_LUCK)
+    settle(computer_ban_luck, -payouts["Ban Luck"], BAN_LUCK)
+
+# Plays the computer's turn in the rounds selected by the drawing mask, drawing the card at next_card of each row
+# of card_ranks and moving next_card on. Draws until the hand is legal and high enough, same as play_round()
+
+
+def dealer_turn(computer, drawing, card_ranks, next_card, dealer_stand_on):
+
+    rows = np.arange(len(card_ranks))
+
+    for i in range(3):
+
+        drawing &= computer.stand_value() < dealer_stand_on
+
+        computer.hit(drawing, card_ranks[rows, next_card])
+        next_card += drawing
+
+        # If hand busts or computer has a Wu Long hand, exit loop
+        hand_value = computer.hand_value()
+        drawing &= ~((hand_value > 21) | (computer.count == 5))
+
+    computer.final_hand_value = np.where(
+        (computer.hand_value() > 21) | (computer.count == 5), computer.hand_value(), computer.stand_value())
+
+# Settles rounds against the computer's final hand through settle(mask, multiplier, special code),
+# which only settles the rounds that are not settled yet
+
+
+def settle_against_dealer(settle, user, computer, payouts):
+
+    # Checking for 777 instant victory conditions
+    settle((computer.sevens == 3) & (computer.count == 3), -payouts["777"], TRIPLE_SEVEN)
+
+    # Check for computer's Wu Long victory and lose conditions
+    computer_wu_long = computer.count == 5
+    settle(computer_wu_long & (computer.final_hand_value > 21), payouts["Busted Wu Long"], BUSTED_WU_LONG)
+    settle(computer_wu_long, -payouts["Wu Long"], WU_LONG)
+
+    # If the computer's hand busts, user wins unless his hand also busts
+    user_busted = user.final_hand_value > 21
+    computer_busted = computer.final_hand_value > 21
+    settle(computer_busted & user_busted, 0)
+    settle(computer_busted, 1)
+    settle(user_busted, -1)
+
+    # Compare hand values
+    settle(user.final_hand_value > computer.final_hand_value, 1)
+    settle(user.final_hand_value < computer.final_hand_value, -1)
+    settle(np.ones(len(computer.count), dtype=bool), 0)
+
+# Holds the running statistics of simulated rounds, from the player's point of view
+# The biggest multiplier is the biggest payout of the rule set the rounds are played with
+
+
+class SimulationStats():
+
+    def __init__(self, max_multiplier=7):
+        self.rounds = 0
+        self.total = 0
+        self.total_squared = 0
+        self.max_multiplier = max_multiplier
+
+        # Number of rounds for each (special hand code, multiplier) pair
+        self.counts = np.zeros((len(special_names), 2 * max_multiplier + 1), dtype=np.int64)
+
+    # Adds a batch of settled rounds
+    def add(self, multiplier, special):
+        multiplier = multiplier.astype(np.int64)
+        self.rounds += len(multiplier)
+        self.total += int(multiplier.sum())
+        self.total_squared += int((multiplier * multiplier).sum())
+        np.add.at(self.counts, (special, multiplier + self.max_multiplier), 1)
+
+    # Adds the statistics of another SimulationStats obj
+    def merge(self, other):
+        self.rounds += other.rounds
+        self.total += other.total
+        self.total_squared += other.total_squared
+        self.counts += other.counts
+
+    # Average payout per unit bet for the player
+    def mean(self):
+        return self.total / self.rounds
+
+    def variance(self):
+        return self.total_squared / self.rounds - self.mean() ** 2
+
+    # Percentage of each bet that the dealer keeps on average
+    def house_edge(self):
+        return -100 * self.mean()
+
+    # Returns a dict of {(special hand name, multiplier): number of rounds}
+    def outcomes(self):
+        return {(special_names[code], int(value) - self.max_multiplier): int(self.counts[code, value])
+                for code, value in zip(*np.nonzero(self.counts))}
+
+    def __str__(self):
+        return (f"{self.rounds} rounds, player EV {self.mean():+.5f} per unit bet, "
+                f"house edge {self.house_edge():.3f}%.")
+
+# Simulates n rounds in chunks of chunk_size rounds and returns a SimulationStats obj
+
+
+def simulate_rounds(n, seed=None, stand_on=None, dealer_stand_on=None, chunk_size=200_000, rules=None):
+
+    return simulate_rule_sets(n, [rules or default_rules], seed, stand_on, dealer_stand_on, chunk_size)[0]
+
+# Simulates n rounds under each RuleSet obj in rule_sets and returns a list of SimulationStats objs in the same order
+# Every rule set settles the same dealt rounds, so the differences between them are only down to the rules
+
+
+def simulate_rule_sets(n, rule_sets, seed=None, stand_on=None, dealer_stand_on=None, chunk_size=200_000):
+
+    rng = np.random.default_rng(seed)
+    all_stats = [SimulationStats(max(rules.payouts.values())) for rules in rule_sets]
+    rounds = 0
+
+    while rounds < n:
+
+        cards = deal_rounds(min(chunk_size, n - rounds), rng)
+        rounds += len(cards)
+
+        for rules, stats in zip(rule_sets, all_stats):
+            stats.add(*settle_rounds(cards, stand_on, dealer_stand_on, rules))
+
+    return all_stats
+
+# Runs one worker's share of a parallel simulation, the arguments are passed as a tuple for map()
+
+
+def _simulate_shard(args):
+
+    return simulate_rule_sets(*args)
+
+# Simulates n rounds split across a pool of worker processes and merges their SimulationStats
+# Each worker gets its own RNG stream spawned from the master seed, so the results only depend on
+# the seed and the number of workers, not on how the processes are scheduled
+
+
+def simulate_parallel(n, workers=None, seed=None, stand_on=None, dealer_stand_on=None, rules=None):
+
+    return simulate_rule_sets_parallel(n, [rules or default_rules], workers, seed, stand_on, dealer_stand_on)[0]
+
+# Simulates n rounds under each RuleSet obj in rule_sets split across a pool of worker processes,
+# and returns a list of merged SimulationStats objs in the same order
+# Every worker settles its rounds under all the rule sets, so they are still compared on the same rounds
+
+
+def simulate_rule_sets_parallel(n, rule_sets, workers=None, seed=None, stand_on=None, dealer_stand_on=None):
+
+    workers = workers or os.cpu_count()
+    streams = np.random.SeedSequence(seed).spawn(workers)
+
+    # Split the rounds as evenly as possible, the first workers take the remainder
+    shards = [(n // workers + (i < n % workers), rule_sets, streams[i], stand_on, dealer_stand_on, 200_000)
+              for i in range(workers)]
+
+    all_stats = [SimulationStats(max(rules.payouts.values())) for rules in rule_sets]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for shard_stats in executor.map(_simulate_shard, shards):
+            for stats, stats_of_shard in zip(all_stats, shard_stats):
+                stats.merge(stats_of_shard)
+
+    return all_stats
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Simulate Chinese Blackjack rounds.")
+    parser.add_argument("rounds", nargs="?", type=int, default=10_000_000)
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes, 0 for all cores")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--rules", metavar="PATH", help="JSON file of one or more house rule sets to compare")
+    args = parser.parse_args()
+
+    if args.rules:
+        rule_sets = load_rule_sets(args.rules)
+
+        if args.workers == 1:
+            all_stats = simulate_rule_sets(args.rounds, rule_sets, args.seed)
+        else:
+            all_stats = simulate_rule_sets_parallel(args.rounds, rule_sets, args.workers, args.seed)
+
+        for rules, stats in zip(rule_sets, all_stats):
+            print(f"{rules}: {stats}")
+    elif args.workers == 1:
+        print(simulate_rounds(args.rounds, args.seed))
+    else:
+        print(simulate_parallel(args.rounds, args.workers, args.seed))
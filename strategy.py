@@ -0,0 +1,329 @@
+import argparse
+import hashlib
+import json
+import os
+import struct
+import tempfile
+
+from blackjack import Card, RuleSet, default_rules
+from probability import (ace_class, class_values, dealer_distribution, full_composition,
+                         remove_cards, seven_class, value_class, value_classes)
+
+"""
+Optimal hit/stand strategy solver for Chinese Blackjack (Ban Luck)
+Finds the decision with the highest expected value for every player hand against every dealer up card
+The hands are solved with the house rules of a RuleSet obj, the standard rules by default
+"""
+
+# Bump this when the solver or the table file format changes, so old cached tables are not loaded
+solver_version = 3
+
+# Folder the solved tables are cached in
+cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "strategy_cache")
+
+# A cached table file starts with its number of entries, so a file that was cut short can be told apart
+# Each entry is (up card class, aces, non-ace total, number of cards, all sevens, hit,
+# expected value of hitting, expected value of standing)
+header_format = struct.Struct("<I")
+entry_format = struct.Struct("<6B2f")
+
+# Returns the rules the solver uses for a RuleSet obj, the cached tables are keyed by a hash of these
+# The rule set's name is left out, so the same rules under another name share their cached table
+
+
+def rule_set(num_decks=8, rules=None):
+
+    rules = (rules or default_rules).to_dict()
+    del rules["name"]
+
+    return {
+        "solver_version": solver_version,
+        "num_decks": num_decks,
+        "rules": rules,
+        "wu_long_cards": 5,
+    }
+
+
+def rule_set_hash(rules):
+
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode()).hexdigest()[:16]
+
+# Function takes in a hand (list of cards) and returns its signature
+# (number of aces, total of the non-ace cards, number of cards, whether all cards are sevens)
+
+
+def hand_signature(list_of_cards):
+
+    aces = 0
+    non_ace_total = 0
+
+    for card in list_of_cards:
+
+        if card.rank == "Ace":
+            aces += 1
+        else:
+            non_ace_total += card.value
+
+    all_sevens = all(card.rank == "Seven" for card in list_of_cards)
+    return (aces, non_ace_total, len(list_of_cards), all_sevens)
+
+# A strategy table class that holds the solved decision for every player hand and dealer up card class
+# Entries are keyed by (up card class, aces, non-ace total, number of cards, all sevens)
+# and hold (hit, expected value of hitting, expected value of standing)
+
+
+class StrategyTable():
+
+    def __init__(self, rules, entries):
+        self.rules = rules
+        self.entries = entries
+
+    # Returns True if the player should hit his hand against the dealer's face up card
+    def should_hit(self, list_of_cards, up_card):
+
+        key = (value_class(up_card.rank),) + hand_signature(list_of_cards)
+
+        # Hands outside the table, such as a busted hand, are not decisions
+        if key not in self.entries:
+            return False
+
+        return self.entries[key][0]
+
+    # A player policy for play_round() that follows the table, using the player's running counts
+    def policy(self, player, up_card):
+
+        key = (value_class(up_card.rank), player.aces, player.non_ace_total, player.num_cards,
+               player.sevens == player.num_cards)
+        entry = self.entries.get(key)
+
+        return entry is not None and entry[0]
+
+    # Writes the table to a binary file
+    # The table is written to a temporary file that is then moved over the path, so a run that is stopped
+    # mid write never leaves half a table behind. Every save gets its own temporary file, so processes that
+    # solve the same rule set at once each move a whole table over the path
+    def save(self, path):
+
+        descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".",
+                                                      prefix=os.path.basename(path) + ".", suffix=".tmp")
+
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(header_format.pack(len(self.entries)))
+                for key, (hit, hit_ev, stand_ev) in self.entries.items():
+                    file.write(entry_format.pack(*key, hit, hit_ev, stand_ev))
+
+            os.replace(temporary_path, path)
+
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+    # Reads a table written by save()
+    # Raises ValueError if the file is not a whole table
+    @classmethod
+    def load(cls, path, rules):
+
+        entries = {}
+
+        with open(path, "rb") as file:
+            data = file.read()
+
+        if len(data) < header_format.size or \
+                len(data) != header_format.size + header_format.unpack_from(data)[0] * entry_format.size:
+            raise ValueError(f"{path} is not a whole strategy table.")
+
+        for entry in entry_format.iter_unpack(memoryview(data)[header_format.size:]):
+            up_class, aces, non_ace_total, num_cards, all_sevens, hit, hit_ev, stand_ev = entry
+            entries[(up_class, aces, non_ace_total, num_cards, bool(all_sevens))] = (bool(hit), hit_ev, stand_ev)
+
+        return cls(rules, entries)
+
+# Returns the player's expected value for each possible player final hand value, against a dealer distribution
+# A final hand value above 21 is a busted player hand
+
+
+def _final_hand_evs(dealer, rules):
+
+    payouts = rules.payouts
+    legal_values = range(rules.stand_minimum, 22)
+    evs = {}
+
+    for player_value in list(legal_values) + [22]:
+
+        # Dealer special hands pay out regardless of the player's hand
+        ev = (-payouts["777"] * dealer["777"] - payouts["Wu Long"] * dealer["Wu Long"]
+              + payouts["Busted Wu Long"] * dealer["Busted Wu Long"])
+
+        # If the computer's hand busts, user wins unless his hand also busts
+        if player_value <= 21:
+            ev += dealer["Bust"]
+
+        for dealer_value in legal_values:
+
+            if player_value > 21 or player_value < dealer_value:
+                ev -= dealer[dealer_value]
+            elif player_value > dealer_value:
+                ev += dealer[dealer_value]
+
+        evs[player_value] = ev
+
+    return evs
+
+# Solves the best play of player hands against one dealer up card, drawing cards with the composition's proportions
+# The composition is of the cards that can still be drawn, without the up card, e.g. from a CompositionTracker obj
+# The player's own cards are not taken out of the composition as he draws
+# Solves the given hand signatures, or every 2 card starting hand that is not a Ban Ban or Ban Luck by default
+# Returns a dict of {(aces, non-ace total, number of cards, all sevens): (hit, hit_ev, stand_ev)}
+# for every hand reached from them
+
+
+def solve_up_card(composition, up_card, hands=None, rules=None):
+
+    rules = rules or default_rules
+    payouts = rules.payouts
+    compute_hand_values = rules.compute_hand_values
+
+    remaining = sum(composition)
+    draw_probabilities = [count / remaining for count in composition]
+
+    # The player only decides when the dealer has no Ban Ban or Ban Luck
+    dealer = dealer_distribution(composition, up_card, rules)
+    no_special = 1 - dealer["Ban Ban"] - dealer["Ban Luck"]
+    dealer = {outcome: probability / no_special for outcome, probability in dealer.items()}
+    final_evs = _final_hand_evs(dealer, rules)
+
+    memo = {}
+
+    # Returns the expected value of a player hand with the best play from here on
+    def hand_ev(aces, non_ace_total, num_cards, all_sevens):
+
+        key = (aces, non_ace_total, num_cards, all_sevens)
+        if key in memo:
+            return memo[key][3]
+
+        hand_value, hand_value_with_ace, legal_hand_value = compute_hand_values(
+            aces, non_ace_total, num_cards)
+
+        # Checking for 777 instant victory condition
+        if num_cards == 3 and all_sevens:
+            return payouts["777"]
+
+        # Check for Wu Long, busted or not
+        if num_cards == 5:
+            return payouts["Wu Long"] if hand_value <= 21 else -payouts["Busted Wu Long"]
+
+        # A busted hand still plays against the dealer
+        if hand_value > 21:
+            return final_evs[22]
+
+        # A hand of 21 always stands
+        if hand_value == 21:
+            return final_evs[21]
+
+        hit_ev = 0
+        for i, probability in enumerate(draw_probabilities):
+
+            if i == ace_class:
+                hit_ev += probability * hand_ev(aces + 1, non_ace_total, num_cards + 1, False)
+            else:
+                hit_ev += probability * hand_ev(aces, non_ace_total + class_values[i], num_cards + 1,
+                                                all_sevens and i == seven_class)
+
+        # A hand can only stand if it is legal
+        stand_ev = final_evs[legal_hand_value] if legal_hand_value else float("-inf")
+        hit = hit_ev > stand_ev
+
+        memo[key] = (hit, hit_ev, stand_ev, max(hit_ev, stand_ev))
+        return memo[key][3]
+
+    if hands is None:
+
+        hands = []
+
+        # Every 2 card starting hand that is not a Ban Ban or Ban Luck
+        for first in range(len(value_classes)):
+            for second in range(first, len(value_classes)):
+
+                aces = (first == ace_class) + (second == ace_class)
+                non_ace_total = (class_values[first] if first != ace_class else 0) + \
+                    (class_values[second] if second != ace_class else 0)
+
+                if aces == 2 or compute_hand_values(aces, non_ace_total, 2)[1] == 21:
+                    continue
+
+                hands.append((aces, non_ace_total, 2, first == second == seven_class))
+
+    for hand in hands:
+        hand_ev(*hand)
+
+    return {key: (hit, hit_ev, stand_ev) for key, (hit, hit_ev, stand_ev, ev) in memo.items()}
+
+# Solves the strategy table for a shoe of num_decks decks, with the house rules of a RuleSet obj
+
+
+def solve_strategy(num_decks=8, rules=None):
+
+    composition = full_composition(num_decks)
+    entries = {}
+
+    for up_class, name in enumerate(value_classes):
+
+        up_card = Card(name, "Spades")
+
+        for key, entry in solve_up_card(remove_cards(composition, [up_card]), up_card, rules=rules).items():
+            entries[(up_class,) + key] = entry
+
+    return StrategyTable(rule_set(num_decks, rules), entries)
+
+# Returns (hit, hit_ev, stand_ev) for a player hand (list of cards) against the dealer's face up card,
+# for the cards left in a composition, e.g. mid shoe:
+#     live_decision(shoe.tracker.composition([computer.hand[1]]), user.hand, computer.hand[0])
+# Returns None for a hand that is not a decision, such as a busted hand
+
+
+def live_decision(composition, list_of_cards, up_card, rules=None):
+
+    signature = hand_signature(list_of_cards)
+    return solve_up_card(composition, up_card, [signature], rules).get(signature)
+
+# Loads the strategy table for the house rules of a RuleSet obj from the cache, or solves and caches it
+# A cached file that is cut short or corrupt is solved again and replaced
+
+
+def load_strategy(num_decks=8, directory=cache_dir, rules=None):
+
+    solver_rules = rule_set(num_decks, rules)
+    path = os.path.join(directory, f"strategy-{rule_set_hash(solver_rules)}.bin")
+
+    if os.path.exists(path):
+        try:
+            return StrategyTable.load(path, solver_rules)
+        except ValueError:
+            pass
+
+    table = solve_strategy(num_decks, rules)
+    os.makedirs(directory, exist_ok=True)
+    table.save(path)
+    return table
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Print the solved Chinese Blackjack hit or stand strategy.")
+    parser.add_argument("--rules", type=RuleSet.load, default=default_rules, metavar="PATH",
+                        help="JSON file of house rules")
+    args = parser.parse_args()
+
+    table = load_strategy(rules=args.rules)
+
+    # Print the decisions for 2 card hands without aces
+    print("Hit (H) or stand (S) for 2 card hands without aces, by dealer up card")
+    print("     " + " ".join(f"{name[:2]:>2}" for name in value_classes))
+
+    for total in range(4, 21):
+        row = []
+        for up_class in range(len(value_classes)):
+            entry = table.entries.get((up_class, 0, total, 2, False))
+            row.append(" -" if entry is None else (" H" if entry[0] else " S"))
+        print(f"{total:>4} " + " ".join(row))
@@ -0,0 +1,48 @@
+from decimal import InvalidOperation
+
+import pytest
+
+from blackjack import Ledger, Player, format_dollars, max_cents, to_cents
+
+
+def test_to_cents_keeps_every_digit():
+    assert to_cents("1234.50") == 123450
+    assert to_cents(" 0.01 ") == 1
+    assert to_cents(-7) == -700
+    assert format_dollars(123450) == "1234.50"
+    assert format_dollars(-5) == "-0.05"
+
+
+@pytest.mark.parametrize("amount", ["0.001", "NaN", "Infinity", "-Infinity", "1e999999999", "abc", ""])
+def test_to_cents_rejects_amounts(amount):
+
+    with pytest.raises(InvalidOperation):
+        to_cents(amount)
+
+
+def test_to_cents_limit():
+
+    assert to_cents(max_cents // 100) == max_cents
+
+    with pytest.raises(InvalidOperation):
+        to_cents(max_cents // 100 + 0.01)
+
+    with pytest.raises(InvalidOperation):
+        to_cents(-max_cents // 100 - 1)
+
+
+@pytest.mark.parametrize("multiplier", [0, 1, -1, 2, -2, 3, -3, 7, -7])
+def test_settle_moves_bet_times_multiplier(multiplier):
+
+    user = Player("Player", 10_000)
+    computer = Player("Computer dealer", 50_000)
+    ledger = Ledger(user, computer)
+    bet = 1234
+
+    ledger.place_bet(bet)
+    assert user.stack == 10_000 - bet
+
+    assert ledger.settle(multiplier) == bet * multiplier
+    assert user.stack == 10_000 + bet * multiplier
+    assert computer.stack == 50_000 - bet * multiplier
+    assert ledger.bet == 0
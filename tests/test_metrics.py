@@ -0,0 +1,44 @@
+from blackjack import Shoe, table_round_steps
+from metrics import Instrumentation, phases
+
+
+# Steps a round once, sending hit when given, and returns its next decision or None when the round is over
+def step_round(steps, hit=None):
+
+    try:
+        return next(steps) if hit is None else steps.send(hit)
+    except StopIteration:
+        return None
+
+
+def test_interleaved_rounds():
+
+    shoes = [Shoe() for table in range(3)]
+    trials = 300
+
+    with Instrumentation() as metrics:
+
+        for trial in range(trials):
+
+            # Start every table's round before any of them is played out
+            rounds = []
+            for shoe in shoes:
+                shoe.start_round()
+                steps = table_round_steps(shoe, 2)
+                rounds.append([steps, step_round(steps)])
+
+            # Take one decision at each table in turn, hitting below 17, until every round is over
+            while any(decision is not None for steps, decision in rounds):
+
+                for table_round in rounds:
+
+                    steps, decision = table_round
+                    if decision is not None:
+                        seat, user, computer = decision
+                        table_round[1] = step_round(steps, user.hand_value < 17)
+
+    assert metrics.rounds == trials * len(shoes)
+    assert metrics.phase_count["deal"] == metrics.rounds
+    assert metrics.phase_count["special"] == metrics.rounds
+    assert set(metrics.phase_seconds) == set(phases)
+    assert all(seconds >= 0 for seconds in metrics.phase_seconds.values())
@@ -0,0 +1,42 @@
+from blackjack import Shoe, count_values, max_seats, play_table_round, ranks
+
+
+def hit_below_21_policy(player, up_card):
+    return player.legal_hand_value < 21
+
+
+# Cards still in the shoe, counted by rank
+def ranks_left(shoe):
+    return {rank: sum(card.rank == rank for card in shoe.all_cards) for rank in ranks}
+
+
+def test_full_table_rounds_from_deep_single_deck():
+
+    shoe = Shoe(num_decks=1, penetration=0.9, seats=max_seats)
+
+    for i in range(2000):
+
+        shoe.start_round()
+        dealt_before = shoe.cards_dealt
+        count_before = shoe.tracker.running_count
+
+        outcomes = play_table_round(shoe, [hit_below_21_policy] * max_seats)
+
+        dealt = outcomes[0].dealer_hand + [card for outcome in outcomes for card in outcome.player_hand]
+        assert shoe.cards_dealt - dealt_before == len(dealt)
+        assert shoe.tracker.running_count - count_before == sum(count_values[card.rank] for card in dealt)
+        assert shoe.tracker.remaining == ranks_left(shoe)
+        assert shoe.tracker.cards_left == len(shoe.all_cards)
+
+
+def test_reshuffle_resets_tracker():
+
+    shoe = Shoe(num_decks=1, penetration=0.9, seats=max_seats)
+
+    while not shoe.needs_shuffle():
+        shoe.deal()
+
+    shoe.start_round()
+    assert shoe.cards_dealt == 0
+    assert shoe.tracker.running_count == 0
+    assert shoe.tracker.remaining == ranks_left(shoe)
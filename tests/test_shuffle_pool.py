@@ -0,0 +1,54 @@
+import pytest
+
+from shuffle_pool import ShufflePool, deck_size, write_pool
+
+
+@pytest.fixture
+def pool_path(tmp_path):
+    path = tmp_path / "pool.bin"
+    write_pool(path, 10, seed=1)
+    return path
+
+
+def test_close_with_rows_in_use(pool_path):
+
+    with ShufflePool(pool_path) as pool:
+        rows = pool.rows(0, 5)
+
+    assert rows.shape == (5, deck_size)
+    assert sorted(rows[0]) == list(range(deck_size))
+
+
+def test_close_with_deck_in_use(pool_path):
+
+    with ShufflePool(pool_path) as pool:
+        deck = pool.deck(3)
+        first = deck.deal_int()
+
+    assert first == pool_path.read_bytes()[3 * deck_size]
+
+
+def test_error_in_with_block_is_not_replaced(pool_path):
+
+    with pytest.raises(KeyError):
+        with ShufflePool(pool_path) as pool:
+            deck = pool.deck(0)
+            rows = pool.rows()
+            raise KeyError(deck, rows)
+
+
+def test_close_twice(pool_path):
+
+    pool = ShufflePool(pool_path)
+    pool.close()
+    pool.close()
+
+
+def test_empty_pool(tmp_path):
+
+    path = tmp_path / "empty.bin"
+    write_pool(path, 0)
+
+    with ShufflePool(path) as pool:
+        assert len(pool) == 0
+        assert pool.rows().shape == (0, deck_size)
@@ -0,0 +1,39 @@
+import pytest
+
+from blackjack import RuleSet, hit_below_policy, play_round
+from shuffle_pool import PoolDeck, ShufflePool, write_pool
+from simulation import cards_per_round, settle_rounds, special_names
+
+rule_sets = [
+    RuleSet(),
+    RuleSet("Generous", ban_ban=4, ban_luck=3, triple_seven=10, wu_long=3, busted_wu_long=1, stand_minimum=15),
+    RuleSet("Strict", ban_luck=1, stand_minimum=17, ace_values=(1, 10, 9)),
+]
+
+
+@pytest.fixture(scope="module")
+def pool(tmp_path_factory):
+    path = tmp_path_factory.mktemp("pool") / "pool.bin"
+    write_pool(path, 4000, seed=7)
+
+    with ShufflePool(path) as pool:
+        yield pool
+
+
+# The simulator has to settle every round the same as play_round() does on the same deck order
+@pytest.mark.parametrize("rules", rule_sets, ids=str)
+@pytest.mark.parametrize("stand_on, dealer_stand_on", [(None, None), (18, None), (None, 18), (21, 17)])
+def test_settle_rounds_matches_play_round(pool, rules, stand_on, dealer_stand_on):
+
+    cards = pool.rows()[:, :cards_per_round]
+    multiplier, special = settle_rounds(cards, stand_on, dealer_stand_on, rules)
+
+    def player_policy(player, up_card):
+        return player.legal_hand_value < (stand_on or rules.stand_minimum)
+
+    dealer_policy = hit_below_policy(dealer_stand_on or rules.stand_minimum)
+
+    for i in range(len(pool)):
+
+        outcome = play_round(pool.deck(i), player_policy, dealer_policy, rules=rules)
+        assert (outcome.multiplier, outcome.special) == (multiplier[i], special_names[special[i]]), i
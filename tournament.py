@@ -0,0 +1,175 @@
+import argparse
+import math
+import random
+
+from blackjack import (CompactDeck, RandomEngine, RuleSet, default_rules, hit_below_policy, hit_soft_policy,
+                       house_dealer_policy, play_round, stand_when_legal_policy)
+
+"""
+Dealer policy tournament for Chinese Blackjack (Ban Luck)
+Plays every dealer policy against every player strategy on the same shuffled decks (common random numbers),
+and reports the player's EV and variance per unit bet with confidence intervals
+The differences between dealer policies are measured round by round, so they need far fewer rounds to tell apart
+"""
+
+# z scores of the two-sided confidence levels
+z_scores = {0.9: 1.645, 0.95: 1.96, 0.99: 2.576}
+
+# Holds the running totals of a stream of payouts per unit bet
+
+
+class RunningTotals():
+
+    def __init__(self):
+        self.rounds = 0
+        self.total = 0
+        self.total_squared = 0
+
+    def add(self, value):
+        self.rounds += 1
+        self.total += value
+        self.total_squared += value * value
+
+    def mean(self):
+        return self.total / self.rounds
+
+    # Sample variance of a single round
+    def variance(self):
+
+        if self.rounds < 2:
+            return 0.0
+
+        return (self.total_squared - self.total * self.total / self.rounds) / (self.rounds - 1)
+
+    # Half width of the confidence interval of the mean
+    def interval(self, z=1.96):
+        return z * math.sqrt(self.variance() / self.rounds)
+
+# Holds the results of a tournament, for every (dealer policy name, player policy name) pair
+
+
+class TournamentResult():
+
+    def __init__(self, dealer_names, player_names, confidence=0.95):
+        self.dealer_names = list(dealer_names)
+        self.player_names = list(player_names)
+        self.z = z_scores[confidence]
+        self.confidence = confidence
+
+        # Payouts of each pair, and their round by round difference from the first dealer policy
+        self.payouts = {(dealer, player): RunningTotals()
+                        for dealer in self.dealer_names for player in self.player_names}
+        self.differences = {(dealer, player): RunningTotals()
+                            for dealer in self.dealer_names[1:] for player in self.player_names}
+
+    def __str__(self):
+
+        baseline = self.dealer_names[0]
+        lines = [f"Player EV per unit bet, {self.confidence:.0%} confidence intervals, "
+                 f"differences against the {baseline} dealer"]
+        lines.append(f"{'dealer':<20} {'player':<20} {'EV':>18} {'variance':>9} {'difference':>18}")
+
+        for (dealer, player), payouts in self.payouts.items():
+
+            line = (f"{dealer:<20} {player:<20} {payouts.mean():>+9.4f} ± {payouts.interval(self.z):.4f} "
+                    f"{payouts.variance():>9.3f}")
+
+            if (dealer, player) in self.differences:
+                difference = self.differences[(dealer, player)]
+                line += f" {difference.mean():>+9.4f} ± {difference.interval(self.z):.4f}"
+
+            lines.append(line)
+
+        return "\n".join(lines)
+
+# Plays rounds rounds of every dealer policy against every player policy and returns a TournamentResult obj
+# The policies are dicts of {name: policy}. Each round shuffles one deck, and every pair plays that same deck
+# The bets are 1 unit, so the payouts are the multipliers
+# Given a ShufflePool obj, round i is played on the pool's deck i instead, see shuffle_pool.py
+
+
+def run_tournament(dealer_policies, player_policies, rounds, seed=None, rules=None, confidence=0.95, pool=None):
+
+    result = TournamentResult(dealer_policies, player_policies, confidence)
+    shuffled = CompactDeck(RandomEngine(random.Random(seed)))
+
+    if pool is not None:
+        rounds = min(rounds, len(pool))
+
+    for i in range(rounds):
+
+        if pool is None:
+            shuffled.shuffle()
+
+        for player, player_policy in player_policies.items():
+
+            baseline = None
+
+            for dealer, dealer_policy in dealer_policies.items():
+
+                if pool is None:
+                    deck = CompactDeck()
+                    deck.all_cards = shuffled.all_cards[:]
+                else:
+                    deck = pool.deck(i)
+
+                payout = play_round(deck, player_policy, dealer_policy, rules=rules).multiplier
+
+                result.payouts[(dealer, player)].add(payout)
+
+                if baseline is None:
+                    baseline = payout
+                else:
+                    result.differences[(dealer, player)].add(payout - baseline)
+
+    return result
+
+
+# Dealer policies that can be picked from the command line
+dealer_policies = {
+    "house": house_dealer_policy,
+    "hit below 17": hit_below_policy(17),
+    "hit below 18": hit_below_policy(18),
+    "hit soft 17": hit_soft_policy(17),
+}
+
+
+# Player policy that hits until the legal hand value reaches 18
+def hit_below_18_policy(player, up_card):
+
+    return player.legal_hand_value < 18
+
+
+player_policies = {
+    "stand when legal": stand_when_legal_policy,
+    "hit below 18": hit_below_18_policy,
+}
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compare Chinese Blackjack dealer policies on the same decks.")
+    parser.add_argument("rounds", nargs="?", type=int, default=20000)
+    parser.add_argument("--dealer", action="append", choices=dealer_policies,
+                        help="dealer policy to play, can be given more than once, all by default")
+    parser.add_argument("--strategy", action="store_true", help="also play the solved strategy, see strategy.py")
+    parser.add_argument("--confidence", type=float, choices=z_scores, default=0.95)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--pool", metavar="PATH", help="play the decks of a shuffle pool file, see shuffle_pool.py")
+    parser.add_argument("--rules", type=RuleSet.load, default=default_rules, metavar="PATH",
+                        help="JSON file of house rules")
+    args = parser.parse_args()
+
+    dealers = {name: dealer_policies[name] for name in args.dealer or dealer_policies}
+    players = dict(player_policies)
+
+    if args.strategy:
+        from strategy import load_strategy
+        players["solved strategy"] = load_strategy(rules=args.rules).policy
+
+    if args.pool:
+        from shuffle_pool import ShufflePool
+        with ShufflePool(args.pool) as pool:
+            print(run_tournament(dealers, players, args.rounds, args.seed, args.rules, args.confidence, pool))
+    else:
+        print(run_tournament(dealers, players, args.rounds, args.seed, args.rules, args.confidence))